@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from orml.models import Query, Snapshot, QueryParameter, SnapshotMeta
+from orml.models import Query, Snapshot, QueryParameter, SnapshotMeta, SnapshotRun, \
+    SnapshotHistory
 
 
 @admin.register(Query)
@@ -21,3 +22,13 @@ class SnapshotAdmin(admin.ModelAdmin):
 @admin.register(SnapshotMeta)
 class SnapshotMetaAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(SnapshotRun)
+class SnapshotRunAdmin(admin.ModelAdmin):
+    pass
+
+
+@admin.register(SnapshotHistory)
+class SnapshotHistoryAdmin(admin.ModelAdmin):
+    raw_id_fields = ['run', ]
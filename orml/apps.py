@@ -0,0 +1,23 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate, post_save, post_delete
+
+
+class OrmlConfig(AppConfig):
+    name = 'orml'
+
+    def ready(self):
+        from django.contrib.contenttypes.models import ContentType
+        from orml.cache import result_cache
+        from orml.helpers import registry
+
+        post_migrate.connect(registry.invalidate,
+                             dispatch_uid='orml_registry_post_migrate')
+        post_save.connect(registry.invalidate, sender=ContentType,
+                          dispatch_uid='orml_registry_post_save')
+        post_delete.connect(registry.invalidate, sender=ContentType,
+                            dispatch_uid='orml_registry_post_delete')
+
+        post_save.connect(result_cache.invalidate,
+                          dispatch_uid='orml_result_cache_post_save')
+        post_delete.connect(result_cache.invalidate,
+                            dispatch_uid='orml_result_cache_post_delete')
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from django.db.models.constants import LOOKUP_SEP
+
+from orml import nodes
+from orml.helpers import HistoryScope, registry
+from orml.parser import compiler
+
+
+def referenced_models(program):
+    """
+    Labels of every model a program reads from, e.g. {'tests.testmodel'},
+    including models reached through relation lookups such as parent__val
+    """
+    apps = registry.get_apps()
+    labels = set()
+    models = []
+    for node in nodes.walk(program.statements):
+        if isinstance(node, nodes.ScopeLookup) and isinstance(node.target, nodes.Name):
+            app = apps.get(node.target.name)
+            if app is not None and app.is_model(node.name):
+                model = app.get_model(node.name)
+                if model is not None:
+                    labels.add(model._meta.label_lower)
+                    models.append(model)
+            elif app is not None and isinstance(app.get(node.name), HistoryScope):
+                # History rows are bulk created, each run saves its SnapshotRun
+                labels.update(('orml.snapshotrun', 'orml.snapshothistory'))
+
+    # Filter keys, accessor names and aggregate arguments are all strings
+    # in the program, any of them can follow relations
+    lookups = set(strings(program.statements))
+    for model in models:
+        for lookup in lookups:
+            labels.update(related_models(model, lookup))
+    return labels
+
+
+def strings(node):
+    if isinstance(node, str):
+        yield node
+    elif isinstance(node, tuple):
+        for child in node:
+            yield from strings(child)
+
+
+def related_models(model, lookup):
+    """
+    Labels of the models lookup follows relations to from model
+    """
+    labels = set()
+    for name in lookup.lstrip('-').split(LOOKUP_SEP):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            break
+        if field.related_model is None:
+            break
+        model = field.related_model
+        labels.add(model._meta.label_lower)
+    return labels
+
+
+class ResultCache:
+    """
+    Caches results of saved queries in the Django cache named by the
+    ORML_RESULT_CACHE setting. Every model has a version counter that is
+    bumped on post_save/post_delete, and result keys include the versions of
+    the models a query reads, so invalidation never has to find old keys.
+    QuerySet.update() and bulk operations don't send signals, entries
+    touched by those expire with their timeout.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def alias(self):
+        return getattr(settings, 'ORML_RESULT_CACHE', None)
+
+    @property
+    def enabled(self):
+        return self.alias is not None
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version_key(self, label):
+        return 'orml:version:{}'.format(label)
+
+    def versions(self, labels):
+        keys = [self.version_key(label) for label in sorted(labels)]
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                # Start from the clock so a lost counter can't come back to
+                # a version an old entry was stored under
+                self.cache.add(key, int(time.time() * 1000), None)
+                versions[key] = self.cache.get(key)
+        return [versions[key] for key in keys]
+
+    def invalidate(self, sender, **kwargs):
+        if not self.enabled:
+            return
+        key = self.version_key(sender._meta.label_lower)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, int(time.time() * 1000), None)
+
+    def result_key(self, program, params, user, versions, format=None):
+        data = json.dumps([
+            program.key,
+            format,
+            sorted(params.items()),
+            user.pk if user is not None else None,
+            versions,
+        ], cls=DjangoJSONEncoder)
+        return 'orml:result:{}'.format(hashlib.sha1(data.encode('utf-8')).hexdigest())
+
+    def lookup(self, source, params, user, format=None):
+        """
+        Returns the compiled program, its result key and the cached result,
+        or the cache itself when there is no cached result
+        """
+        program = compiler.compile(source)
+        key = self.result_key(program, params, user,
+                              self.versions(referenced_models(program)), format)
+
+        result = self.cache.get(key, self)
+        with self.lock:
+            if result is not self:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return program, key, result
+
+    def store(self, key, result, timeout):
+        if isinstance(result, QuerySet):
+            result = list(result)
+        self.cache.set(key, result, timeout)
+        return result
+
+    def get_or_execute(self, source, params, user, timeout, run, format=None):
+        program, key, result = self.lookup(source, params, user, format)
+        if result is not self:
+            return result
+        return self.store(key, run(program), timeout)
+
+    async def aget_or_execute(self, source, params, user, timeout, arun):
+        program, key, result = await sync_to_async(self.lookup)(source, params, user)
+        if result is not self:
+            return result
+        return await sync_to_async(self.store)(key, await arun(program), timeout)
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+
+result_cache = ResultCache()
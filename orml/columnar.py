@@ -0,0 +1,147 @@
+from array import array
+
+from django.db.models import QuerySet
+from django.db.models.query import FlatValuesListIterable
+
+from orml.utils import is_model_queryset, row_values
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Columns(dict):
+    """
+    Column store for results, maps each column name to an array of values.
+    Numeric columns are array.array (or NumPy arrays when NumPy is
+    installed), anything else, including numeric columns with nulls, is kept
+    as a list (or NumPy object array). Rows are only built when asked for.
+    """
+    def __init__(self, columns, length):
+        super(Columns, self).__init__(columns)
+        self.length = length
+
+    def row(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('row index out of range')
+        return dict((name, column[index]) for name, column in self.items())
+
+    def rows(self):
+        names = list(self.keys())
+        for values in zip(*self.values()):
+            yield dict(zip(names, values))
+
+
+class ColumnBuilder:
+    """
+    Appends chunks of values to a typed array, falling back to a list the
+    first time a value doesn't fit the array's type
+    """
+    def __init__(self):
+        self.data = None
+
+    def extend(self, values):
+        if self.data is None:
+            self.data = array(typecode(values)) if typecode(values) else []
+        if type(self.data) is array and self.data.typecode == 'q' \
+                and typecode(values) == 'd':
+            self.data = array('d', self.data)
+        if type(self.data) is array:
+            length = len(self.data)
+            try:
+                self.data.extend(values)
+                return
+            except (TypeError, OverflowError):
+                # array.extend appends one by one, drop the partial chunk
+                data = self.data[:length].tolist()
+                if self.data.typecode == 'b':
+                    data = [bool(v) for v in data]
+                self.data = data
+        self.data.extend(values)
+
+    def build(self):
+        data = self.data if self.data is not None else []
+        if numpy is None:
+            return data
+        if type(data) is array:
+            return numpy.frombuffer(data, dtype=data.typecode)
+        return numpy.fromiter(data, dtype=object, count=len(data))
+
+
+def typecode(values):
+    """
+    array.array typecode for a chunk of values, None when they need a list
+    """
+    types = set(type(v) for v in values)
+    if types == {bool}:
+        return 'b'
+    elif types == {int}:
+        return 'q'
+    elif types and types <= {int, float}:
+        return 'd'
+    return None
+
+
+def queryset_columns(queryset):
+    """
+    Column names of a QuerySet and the values_list QuerySet to read them with
+    """
+    if is_model_queryset(queryset):
+        return row_values(queryset)
+
+    query = queryset.query
+    names = list(query.values_select) + list(query.annotation_select)
+    if issubclass(queryset._iterable_class, FlatValuesListIterable):
+        return names[:1], queryset
+    return names, queryset.values_list(*names)
+
+
+def columnar(value, chunk_size=2000):
+    """
+    Converts a result to Columns. QuerySets are read in chunks with
+    values_list, so no row dicts or model instances are built. Lists of dicts
+    and scalars, and aggregate dicts, are converted as well. Anything else is
+    returned as is.
+    """
+    if isinstance(value, QuerySet):
+        names, queryset = queryset_columns(value)
+        flat = issubclass(queryset._iterable_class, FlatValuesListIterable)
+        builders = [ColumnBuilder() for name in names]
+        chunk = []
+        length = 0
+        for row in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                length += extend(builders, chunk, flat)
+                chunk = []
+        length += extend(builders, chunk, flat)
+        return Columns(zip(names, (b.build() for b in builders)), length)
+    elif type(value) is list:
+        if value and all(type(row) is dict for row in value):
+            names = list(value[0].keys())
+            builders = [ColumnBuilder() for name in names]
+            for name, builder in zip(names, builders):
+                builder.extend([row.get(name) for row in value])
+            return Columns(zip(names, (b.build() for b in builders)), len(value))
+        builder = ColumnBuilder()
+        builder.extend(value)
+        return Columns([('value', builder.build())], len(value))
+    elif type(value) is dict:
+        return columnar([value], chunk_size)
+    elif numpy is not None and isinstance(value, numpy.ndarray):
+        return Columns([('value', value)], len(value))
+    return value
+
+
+def extend(builders, chunk, flat):
+    if not chunk:
+        return 0
+    if flat:
+        builders[0].extend(chunk)
+    else:
+        for builder, values in zip(builders, zip(*chunk)):
+            builder.extend(values)
+    return len(chunk)
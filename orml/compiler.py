@@ -0,0 +1,225 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import ply.lex as lex
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from orml import lexer, nodes
+from orml.executor import Executor, AsyncExecutor, aggregates
+
+
+class Program:
+    """
+    Compiled ORML source. Programs are immutable and shared between threads,
+    all execution state lives on the scope they are executed against.
+    """
+    def __init__(self, key, source, statements, explain=False):
+        self.key = key
+        self.source = source
+        self.statements = statements
+        # Set when a statement is prefixed with explain, executing the
+        # program then returns its profile
+        self.explain = explain
+
+    def __len__(self):
+        return len(self.statements)
+
+    def __iter__(self):
+        return iter(self.statements)
+
+    def execute(self, scope, workers=None):
+        return Executor(scope).run(self, workers)
+
+    def profile(self, scope):
+        from orml.profiler import ProfilingExecutor
+        return ProfilingExecutor(scope).run(self)
+
+    @cached_property
+    def dependencies(self):
+        """
+        For every statement, the indexes of the earlier statements it has to
+        run after: the ones assigning a name it reads, and the ones reading or
+        assigning the name it assigns.
+        """
+        assigned = []
+        read = []
+        for statement in self.statements:
+            if isinstance(statement, nodes.Assign):
+                assigned.append({statement.name})
+            else:
+                assigned.append(set())
+            read.append(nodes.names(statement))
+
+        dependencies = []
+        for i in range(len(self.statements)):
+            dependencies.append(set(
+                j for j in range(i)
+                if assigned[j] & read[i] or assigned[i] & (read[j] | assigned[j])
+            ))
+        return dependencies
+
+    @cached_property
+    def aggregate_groups(self):
+        """
+        Lists of statement indexes whose accessors only aggregate over the
+        same filter, with nothing assigned in between that they read. Each
+        list can run as a single aggregate() query.
+        """
+        candidates = OrderedDict()
+        for i, statement in enumerate(self.statements):
+            accessor = statement
+            if isinstance(statement, nodes.Assign):
+                accessor = statement.value
+            if isinstance(accessor, nodes.Accessor) and \
+                    isinstance(accessor.target, nodes.Filter) and \
+                    is_aggregate_key(accessor.key):
+                candidates.setdefault(accessor.target, []).append(i)
+
+        groups = []
+        for indexes in candidates.values():
+            group = [indexes[0]]
+            read = nodes.names(self.statements[indexes[0]])
+            for i in indexes[1:]:
+                read_i = nodes.names(self.statements[i])
+                assigned = set(s.name for s in self.statements[group[0]:i]
+                               if isinstance(s, nodes.Assign))
+                if assigned & (read | read_i):
+                    groups.append(group)
+                    group = [i]
+                    read = read_i
+                else:
+                    group.append(i)
+                    read |= read_i
+            groups.append(group)
+        return sorted(g for g in groups if len(g) > 1)
+
+    async def aexecute(self, scope):
+        return await AsyncExecutor(scope).arun(self)
+
+    def columns(self, scope, chunk_size=2000):
+        return Executor(scope).columns(self, chunk_size)
+
+    def iterate(self, scope, chunk_size, prepare=None):
+        return Executor(scope).stream(self, chunk_size, prepare)
+
+
+def is_aggregate(node):
+    if isinstance(node, nodes.Call):
+        return node.name in aggregates
+    elif isinstance(node, nodes.BinOp):
+        return (is_aggregate(node.left) or type(node.left) in (int, float)) and \
+            (is_aggregate(node.right) or type(node.right) in (int, float))
+    elif isinstance(node, nodes.Negate):
+        return is_aggregate(node.operand)
+    return False
+
+
+def is_aggregate_key(key):
+    """
+    True for accessor keys made of aggregates only, e.g. [Avg(val), n: Count(id)]
+    """
+    if isinstance(key, nodes.Dict):
+        return bool(key.items) and all(is_aggregate(v) for k, v in key.items)
+    elif isinstance(key, nodes.List):
+        return all(isinstance(a, nodes.Call) and is_aggregate(a) for a in key.items)
+    elif isinstance(key, nodes.ArgsKwargs):
+        return all(isinstance(a, nodes.Call) and is_aggregate(a) for a in key.args) \
+            and all(is_aggregate(v) for k, v in key.kwargs)
+    return isinstance(key, nodes.Call) and is_aggregate(key)
+
+
+def normalize(statements):
+    if type(statements) is str:
+        statements = statements.split('\n')
+    return tuple(s for s in statements if s)
+
+
+def source_key(statements):
+    return hashlib.sha1('\0'.join(statements).encode('utf-8')).hexdigest()
+
+
+class Compiler:
+    """
+    Compiles ORML source into Programs. The lexer is built once and cloned for
+    every compile, and each thread parses with its own copy of the LR parser
+    since PLY keeps the parse stacks on the parser instance.
+    """
+    def __init__(self, parser, cache_size=None):
+        self.parser = parser
+        self.lexer = lexer.ContextLexer(lex.lex(module=lexer))
+        self.local = threading.local()
+        if cache_size is None:
+            cache_size = getattr(settings, 'ORML_PROGRAM_CACHE_SIZE', 512)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, statements):
+        statements = normalize(statements)
+        key = source_key(statements)
+
+        with self.lock:
+            program = self.cache.get(key)
+            if program is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return program
+            self.misses += 1
+
+        parser = self.get_parser()
+        tokenizer = self.lexer.clone()
+        explain = False
+        compiled = []
+        for s in statements:
+            node = parser.parse(s, lexer=tokenizer)
+            if isinstance(node, nodes.Explain):
+                explain = True
+                node = node.statement
+            compiled.append(node)
+        program = Program(key, statements, tuple(compiled), explain)
+
+        if self.cache_size:
+            with self.lock:
+                self.cache[key] = program
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return program
+
+    def timings(self, statements):
+        """
+        Lexes and parses statements without the cache, returns the seconds
+        spent lexing and parsing each statement
+        """
+        parser = self.get_parser()
+        timings = []
+        for s in normalize(statements):
+            tokenizer = self.lexer.clone()
+            start = time.perf_counter()
+            tokenizer.input(s)
+            for token in tokenizer:
+                pass
+            lexed = time.perf_counter()
+            parser.parse(s, lexer=self.lexer.clone())
+            parsed = time.perf_counter()
+            # Parsing lexes the statement again
+            timings.append((lexed - start, max(parsed - lexed - (lexed - start), 0)))
+        return timings
+
+    def get_parser(self):
+        parser = getattr(self.local, 'parser', None)
+        if parser is None:
+            # Parse tables are shared, only the parse state is per thread
+            parser = self.local.parser = copy.copy(self.parser)
+        return parser
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.hits = 0
+            self.misses = 0
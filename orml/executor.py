@@ -0,0 +1,835 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Q, QuerySet, Avg, Sum, Count, Max, Min
+from django.db.models.base import ModelBase
+from django.db.models.query import FlatValuesListIterable, ValuesListIterable
+
+from orml import nodes, vector
+from orml.columnar import columnar
+from orml.helpers import ArgsKwargs, History, Scope
+from orml.limits import Guard, Limits
+from orml.utils import max_float, count_distinct, \
+    split_queryset_arguments, count_all, is_model_queryset, flat_column, row_values
+
+
+functions = {
+    # Aggregates
+    'Sum': Sum,
+    'Avg': Avg,
+    'Count': Count,
+    'CountAll': count_all,
+    'CountDistinct': count_distinct,
+    'Max': Max,
+    'MaxFloat': max_float,
+    'Min': Min,
+
+    # Misc functions, reductions run on NumPy arrays when given one
+    'sum': vector.total,
+    'average': vector.average,
+    'min': vector.minimum,
+    'max': vector.maximum,
+    'percentile': vector.percentile,
+    'len': len,
+}
+
+# Functions returning aggregates, accessors using only these can be fused
+aggregates = {
+    'Sum', 'Avg', 'Count', 'CountAll', 'CountDistinct', 'Max', 'MaxFloat', 'Min',
+}
+
+# Misc functions that run as an SQL aggregate when called on a single column
+# QuerySet, with the value to return for an empty QuerySet, None when there
+# is no such value
+column_aggregates = {
+    'sum': (Sum, 0),
+    'average': (Avg, 0.0),
+    'min': (Min, None),
+    'max': (Max, None),
+}
+
+
+class Executor:
+    """
+    Evaluates a compiled Program against a scope (a MultiParser)
+    """
+    def __init__(self, scope):
+        self.scope = scope
+        self.prepare = None
+        self.fused = {}
+        self.guard = Guard(getattr(scope, 'limits', None) or Limits())
+
+    def run(self, program, workers=None):
+        if workers is None:
+            workers = getattr(settings, 'ORML_STATEMENT_WORKERS', 1)
+
+        with self.guard.watch():
+            if workers > 1 and len(program.statements) > 1 and not in_transaction():
+                self.scope.stack += self.run_concurrent(program, workers)
+            else:
+                self.run_sequential(program, program.statements)
+
+            # Assign last stack statement result as multi parser result
+            if self.scope.stack:
+                result = self.scope.stack[-1]
+                if self.guard.active and isinstance(result, QuerySet):
+                    # Fetched here so the limits apply to it
+                    result = self.fetch(result)
+                self.scope.result = result
+
+        return self.scope.result
+
+    def run_sequential(self, program, statements):
+        groups = dict((g[0], g) for g in program.aggregate_groups)
+        for i, statement in enumerate(statements):
+            if i in groups:
+                self.fuse_aggregates([program.statements[j] for j in groups[i]])
+            self.scope.stack.append(self.settle(self.evaluate(statement)))
+            self.check_memory()
+
+    def check_memory(self):
+        if self.guard.limits.max_memory is not None:
+            self.guard.check_memory(self.scope.stack + list(self.scope.public.values()))
+
+    def fetch(self, value):
+        """
+        Fetches a QuerySet's rows when limits apply, reading at most one row
+        more than max_rows allows
+        """
+        if not self.guard.active or not isinstance(value, QuerySet):
+            return value
+        remaining = self.guard.remaining_rows()
+        if remaining is not None and value._result_cache is None:
+            rows = list(value[:remaining + 1])
+        else:
+            rows = list(value)
+        self.guard.count_rows(len(rows))
+        return rows
+
+    def settle(self, value):
+        """
+        Fetches a pipe's columns at the end of a statement, so variables and
+        results are lists, as when the pipe ran over fetched rows. Pipes used
+        inline, e.g. in sum() or an __in filter, stay in SQL. NumPy arrays
+        from element-wise operators are turned into lists too.
+        """
+        if is_values_list(value):
+            return [as_list(row) for row in self.fetch(value)]
+        elif vector.is_array(value):
+            return value.tolist()
+        return value
+
+    def fuse_aggregates(self, statements):
+        """
+        Runs the aggregates of accessors on the same filter as one aggregate()
+        call, and keeps each accessor's part of the result for when its
+        statement runs. Aliases are prefixed so they can't clash.
+        """
+        accessors = [s.value if isinstance(s, nodes.Assign) else s for s in statements]
+        queryset = self.evaluate(accessors[0].target)
+        if not isinstance(queryset, QuerySet):
+            return
+
+        kwargs = {}
+        aliases = []
+        for n, accessor in enumerate(accessors):
+            values, aggregate_args, aggregate_kwargs = \
+                split_queryset_arguments(self.evaluate(accessor.key))
+            if len(values):
+                return
+            aggregate_kwargs = dict(aggregate_kwargs)
+            try:
+                for aggregate in aggregate_args:
+                    aggregate_kwargs[aggregate.default_alias] = aggregate
+            except TypeError:
+                # Complex aggregates without an alias
+                return
+            names = {}
+            for alias, aggregate in aggregate_kwargs.items():
+                names['orml{}_{}'.format(n, alias)] = alias
+                kwargs['orml{}_{}'.format(n, alias)] = aggregate
+            aliases.append(names)
+
+        result = queryset.aggregate(**kwargs)
+        for accessor, names in zip(accessors, aliases):
+            self.fused.setdefault(accessor, []).append(
+                dict((alias, result[key]) for key, alias in names.items()))
+
+    def run_concurrent(self, program, workers):
+        """
+        Runs statements on a thread pool as soon as the statements they depend
+        on are done. Statements are submitted in order and the pool starts
+        them in order, so a statement never waits on one that hasn't started.
+        Not used inside a transaction, see in_transaction().
+        """
+        futures = []
+        used = set()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for i, statement in enumerate(program.statements):
+                    dependencies = [futures[j] for j in program.dependencies[i]]
+                    futures.append(pool.submit(self.run_statement, statement, dependencies, used))
+                return [f.result() for f in futures]
+        finally:
+            # Pool threads open their own connections, they are reused by
+            # the thread's next statements and closed once the pool is done
+            close_connections(used)
+
+    def run_statement(self, statement, dependencies, used):
+        for dependency in dependencies:
+            dependency.result()
+        try:
+            with self.guard.watch():
+                return self.settle(self.evaluate(statement))
+        finally:
+            used.update(connections.all(initialized_only=True))
+
+    def evaluate(self, node):
+        if isinstance(node, nodes.Node):
+            if self.guard.deadline is not None:
+                self.guard.check_time()
+            return getattr(self, 'eval_' + node.kind)(node)
+        return node
+
+    def eval_name(self, node):
+        if self.scope.has(node.name):
+            return self.scope.get(node.name)
+        return node.name
+
+    def eval_scope(self, node):
+        if isinstance(node.target, nodes.Name):
+            name = node.target.name
+            if self.scope.has(name):
+                scope = self.scope.get(name)
+                if isinstance(scope, Scope) or isinstance(scope, dict):
+                    return scope.get(node.name)
+            return None
+        return self.evaluate(node.target).get(node.name)
+
+    def eval_filter(self, node):
+        model = self.evaluate(node.target)
+        if type(model) is ModelBase:
+            query = self.evaluate(node.query)
+            if type(query) is dict:
+                return model.objects.filter(**query)
+            return model.objects.filter(query)
+        elif isinstance(model, History):
+            return model.filter(self.evaluate(node.query))
+
+    def eval_call(self, node):
+        if node.name in functions:
+            args = [self.evaluate(a) for a in node.args]
+            if len(args) == 1 and isinstance(args[0], QuerySet):
+                result = self.call_on_queryset(node.name, args[0])
+                if result is not None:
+                    return result
+            return functions[node.name](*[self.fetch(a) for a in args])
+
+    def call_on_queryset(self, name, queryset):
+        if name == 'len':
+            return queryset.count()
+        if name in column_aggregates:
+            column = flat_column(queryset)
+            if column is not None:
+                aggregate = column_aggregates[name][0]
+                result = queryset.aggregate(result=aggregate(column))['result']
+                return aggregate_result(name, result)
+
+    def eval_binop(self, node):
+        # Element-wise when either side is a list or column
+        return vector.apply(node.op, *self.operands(node.left, node.right))
+
+    def eval_negate(self, node):
+        return vector.negate(self.fetch(self.evaluate(node.operand)))
+
+    def eval_equals(self, node):
+        return vector.apply('==', *self.operands(node.left, node.right))
+
+    def eval_compare(self, node):
+        return vector.apply(node.op, *self.operands(node.left, node.right))
+
+    def operands(self, left, right):
+        # Columns from pipes are fetched here so the limits apply to them
+        left, right = aligned(self.evaluate(left), self.evaluate(right))
+        return self.fetch(left), self.fetch(right)
+
+    def eval_assign(self, node):
+        self.scope.set(node.name, self.settle(self.evaluate(node.value)))
+
+    def eval_list(self, node):
+        return [self.evaluate(i) for i in node.items]
+
+    def eval_dict(self, node):
+        return {k: self.evaluate(v) for k, v in node.items}
+
+    def eval_argskwargs(self, node):
+        argskwargs = ArgsKwargs()
+        argskwargs.add([self.evaluate(a) for a in node.args])
+        argskwargs.add({k: self.evaluate(v) for k, v in node.kwargs})
+        return argskwargs
+
+    def eval_querychain(self, node):
+        return self.as_q(self.evaluate(node.left)) | \
+            self.as_q(self.evaluate(node.right))
+
+    def as_q(self, query):
+        if type(query) is dict:
+            return Q(**query)
+        return query
+
+    def eval_pipe(self, node):
+        value = self.lazy(node.target)
+        if isinstance(node.target, nodes.Name):
+            value = self.fetch_once(value)
+        key = self.evaluate(node.key)
+        projected = self.project(value, key)
+        if projected is not None:
+            return projected
+        return [self.pipe(l, key) for l in self.fetch(value)]
+
+    def fetch_once(self, value):
+        """
+        Fetches the rows of a QuerySet in a variable, so every pipe on it reads
+        the same rows in the same order, e.g. a@price - a@cost
+        """
+        if isinstance(value, QuerySet) and value._result_cache is None and \
+                not is_model_queryset(value):
+            value._result_cache = list(self.fetch(value))
+        return value
+
+    def project(self, value, key):
+        """
+        Pipes on a QuerySet select only the piped columns in SQL, returns None
+        when the pipe has to run in Python instead. Rows already fetched are
+        piped in Python rather than queried again.
+        """
+        if not isinstance(value, QuerySet):
+            return None
+        if value._result_cache is not None and not is_model_queryset(value):
+            return None
+        if type(key) is str:
+            return value.values_list(key, flat=True)
+        elif type(key) is list and key and all(type(k) is str for k in key):
+            return value.values_list(*key)
+
+    def pipe(self, row, key):
+        if type(key) is list:
+            return [row[n] for n in key]
+        elif type(key) is str:
+            return row.get(key)
+        elif type(key) is int:
+            return row[key]
+
+    def eval_accessor(self, node):
+        if self.fused.get(node):
+            return self.fused[node].pop(0)
+
+        value = self.access(self.evaluate(node.target), self.evaluate(node.key))
+
+        # if value is still a queryset of models, read its rows as dicts
+        if is_model_queryset(value):
+            return self.model_rows(value)
+        return value
+
+    def eval_page(self, node):
+        value = self.lazy(node)
+        if isinstance(nodes.unpaged(node), nodes.Accessor) and is_model_queryset(value):
+            return self.model_rows(value)
+        return value
+
+    def model_rows(self, queryset):
+        # Rows straight from values_list, no model instances are built
+        names, values = row_values(queryset)
+        return [dict(zip(names, row)) for row in self.fetch(values)]
+
+    def page(self, value, node):
+        """
+        Applies a Page's after, order, offset and limit clauses. On QuerySets
+        they run in SQL as a keyset filter, order_by() and LIMIT/OFFSET.
+        """
+        order = list(node.order)
+        after = self.evaluate(node.after)
+        offset = self.evaluate(node.offset)
+        limit = self.evaluate(node.limit)
+
+        if isinstance(value, QuerySet) and value.query.is_sliced and (order or after is not None):
+            # Paged inside parentheses, a limited QuerySet can't be reordered
+            value = self.model_rows(value) if is_model_queryset(value) else list(self.fetch(value))
+
+        if isinstance(value, QuerySet):
+            if after is not None:
+                order = keyset_order(value, order)
+                value = value.filter(self.keyset(value, order, after))
+            if order:
+                # Nulls are lowest on every database, as on lists, so a
+                # keyset continues the order of the page before it
+                value = value.order_by(*nulls_first(order))
+        elif type(value) is list:
+            if after is not None:
+                raise ValueError('after is only supported on QuerySets')
+            # Stable sorts from the last key to the first
+            try:
+                for key in reversed(order):
+                    value = sorted(value, key=sort_key(key.lstrip('-')),
+                                   reverse=key.startswith('-'))
+            except TypeError as e:
+                raise ValueError('Can\'t order by {}: {}'.format(', '.join(order), e))
+        else:
+            raise ValueError('order, limit, offset and after need a QuerySet or a list')
+
+        start = offset or 0
+        if limit is not None:
+            return value[start:start + limit]
+        elif start:
+            return value[start:]
+        return value
+
+    def keyset(self, queryset, order, cursor):
+        """
+        Q for the rows after the row with pk cursor in order, i.e.
+        (a > a0) | (a = a0 & b > b0) | ... with the cursor row's values.
+        Nulls are lower than any value.
+        """
+        check_keyset(queryset, order)
+        fields = [key.lstrip('-') for key in order]
+        if fields == ['pk']:
+            values = [cursor]
+        else:
+            row = queryset.model._default_manager.filter(pk=cursor).values(*fields).first()
+            if row is None:
+                raise ValueError('after: {} {} does not exist'.format(
+                    queryset.model._meta.label_lower, cursor))
+            values = [row[f] for f in fields]
+
+        q = Q()
+        for i, key in enumerate(order):
+            if key.startswith('-'):
+                if values[i] is None:
+                    # Nothing is lower than null
+                    continue
+                term = Q(**{fields[i] + '__lt': values[i]}) | Q(**{fields[i] + '__isnull': True})
+            elif values[i] is None:
+                term = Q(**{fields[i] + '__isnull': False})
+            else:
+                term = Q(**{fields[i] + '__gt': values[i]})
+            for field, value in zip(fields[:i], values[:i]):
+                term &= Q(**{field + '__isnull': True}) if value is None else Q(**{field: value})
+            q |= term
+        return q
+
+    def access(self, value, key):
+        if type(value) is list and type(key) is int:
+            return value[key]
+        elif vector.is_array(value) and type(key) is int:
+            return vector.scalar(value[key])
+        elif is_values_list(value) and type(key) in (int, slice):
+            return self.index(value, key)
+        elif isinstance(value, QuerySet):
+            value, aggregates = self.access_queryset(value, key)
+            if aggregates is not None:
+                return value.aggregate(*aggregates.args, **aggregates.kwargs)
+            return value
+        elif type(value) is dict:
+            return value.get(key)
+
+    def index(self, queryset, key):
+        """
+        An item, or a slice, of a pipe's column. Positive indexes run as
+        LIMIT/OFFSET, negative ones on the fetched rows.
+        """
+        if type(key) is slice:
+            if any(i is not None and i < 0 for i in (key.start, key.stop, key.step)) or \
+                    queryset._result_cache is not None:
+                rows = list(self.fetch(queryset))[key]
+            else:
+                rows = self.fetch(queryset[key])
+            return [as_list(r) for r in rows]
+        if key < 0 or queryset._result_cache is not None:
+            return as_list(list(self.fetch(queryset))[key])
+        row = queryset[key]
+        self.guard.count_rows(1)
+        return as_list(row)
+
+    def access_queryset(self, queryset, key):
+        """
+        Applies values, distinct and annotations for an accessor key. Returns
+        the QuerySet and the aggregates left to run on it, if any.
+        """
+        values, aggregate_args, aggregate_kwargs = split_queryset_arguments(key)
+        distinct = False
+        if len(values):
+            if 'distinct' in values:
+                values.remove('distinct')
+                queryset = queryset.values(*values).distinct()
+                distinct = True
+            else:
+                queryset = queryset.values(*values)
+
+        aggregates = None
+        if len(aggregate_args) or len(aggregate_kwargs):
+            if distinct:
+                queryset = queryset.annotate(*aggregate_args, **aggregate_kwargs)
+            else:
+                aggregates = ArgsKwargs()
+                aggregates.add(aggregate_args)
+                aggregates.add(aggregate_kwargs)
+        return queryset, aggregates
+
+    def stream(self, program, chunk_size, prepare=None):
+        """
+        Runs every statement but the last one, then yields the rows of the last
+        statement lazily. QuerySets are read with .iterator() and pipes are
+        applied row by row as they come in. prepare, if given, is called with
+        the last statement's QuerySet and returns the QuerySet to iterate.
+        """
+        statements = program.statements
+        if not statements:
+            return
+        self.prepare = prepare
+        with self.guard.watch():
+            self.run_sequential(program, statements[:-1])
+        rows = self.iterate(statements[-1], chunk_size)
+        if self.guard.active:
+            rows = self.watched(self.guard.limit(rows), chunk_size)
+        yield from rows
+
+    def watched(self, rows, chunk_size):
+        """
+        Reads rows a chunk at a time with the guard's execute wrapper
+        installed, it's never left on the connection while the caller holds
+        the generator
+        """
+        while True:
+            with self.guard.watch():
+                chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield from chunk
+
+    def columns(self, program, chunk_size):
+        """
+        Runs the program and returns the last statement's result as Columns,
+        QuerySets are read straight into arrays with values_list
+        """
+        statements = program.statements
+        with self.guard.watch():
+            self.run_sequential(program, statements[:-1])
+            if statements:
+                node = statements[-1]
+                if self.fused.get(node):
+                    value = self.fused[node].pop(0)
+                else:
+                    value = self.lazy(node)
+                remaining = self.guard.remaining_rows()
+                if isinstance(value, QuerySet) and remaining is not None:
+                    # Reads at most one row more than max_rows allows
+                    value = value[:remaining + 1]
+                self.scope.stack.append(columnar(value, chunk_size))
+                self.scope.result = self.scope.stack[-1]
+                if isinstance(value, QuerySet):
+                    self.guard.count_rows(self.scope.result.length)
+        return self.scope.result
+
+    def iterate(self, node, chunk_size):
+        if isinstance(node, nodes.Pipe):
+            key = self.evaluate(node.key)
+            value = self.lazy(node.target)
+            projected = self.project(value, key)
+            if projected is not None:
+                for row in self.rows(projected, chunk_size):
+                    yield as_list(row)
+            else:
+                for row in self.rows(value, chunk_size):
+                    yield self.pipe(row, key)
+        else:
+            yield from self.rows(self.lazy(node), chunk_size)
+
+    def lazy(self, node):
+        # Same as evaluate, but QuerySets from accessors are left unevaluated
+        if isinstance(node, nodes.Accessor):
+            return self.access(self.evaluate(node.target), self.evaluate(node.key))
+        elif isinstance(node, nodes.Page):
+            return self.page(self.lazy(node.target), node)
+        return self.evaluate(node)
+
+    def rows(self, value, chunk_size):
+        if isinstance(value, QuerySet) and self.prepare is not None:
+            value = self.prepare(value)
+
+        if is_model_queryset(value):
+            names, values = row_values(value)
+            for row in values.iterator(chunk_size=chunk_size):
+                yield dict(zip(names, row))
+        elif isinstance(value, QuerySet):
+            yield from value.iterator(chunk_size=chunk_size)
+        elif type(value) is list:
+            yield from value
+        elif vector.is_array(value):
+            yield from value.tolist()
+        elif value is not None:
+            yield value
+
+
+def aggregate_result(name, result):
+    # The SQL aggregate is None on an empty column, the Python function would
+    # raise on it too when it has no default
+    if result is not None:
+        return result
+    default = column_aggregates[name][1]
+    if default is None:
+        raise ValueError('{}() of an empty column'.format(name))
+    return default
+
+
+def sort_key(name):
+    # Key for ordering a list of dicts by name, nulls sort first
+    def key(row):
+        if type(row) is not dict:
+            raise ValueError('order on a list needs rows of dicts, not {}'.format(
+                type(row).__name__))
+        value = row.get(name)
+        return value is not None, value
+    return key
+
+
+def in_transaction():
+    # Pool threads use their own connections, they can't see rows written
+    # in this thread's open transaction
+    return any(connection.in_atomic_block for connection in connections.all())
+
+
+def close_connections(used):
+    # Closes connections opened by other threads, once they are done
+    for connection in used:
+        connection.inc_thread_sharing()
+        try:
+            connection.close()
+        finally:
+            connection.dec_thread_sharing()
+
+
+def check_keyset(queryset, order):
+    # Rows of grouped results have no primary key, and annotations can't be
+    # read from the cursor row
+    query = queryset.query
+    if query.group_by is not None or query.distinct:
+        raise ValueError('after is not supported on grouped or distinct results')
+    annotated = [key for key in order if key.lstrip('-') in query.annotations]
+    if annotated:
+        raise ValueError('after can\'t order by annotations: {}'.format(', '.join(annotated)))
+
+
+def nulls_first(order):
+    # Order expressions with nulls lowest, whatever the database's default
+    return [F(key[1:]).desc(nulls_last=True) if key.startswith('-')
+            else F(key).asc(nulls_first=True) for key in order]
+
+
+def keyset_order(queryset, order):
+    """
+    Order for keyset pagination, ends with the primary key so every row has
+    a unique position
+    """
+    pk = queryset.model._meta.pk.name
+    if not order:
+        return ['pk']
+    if order[-1].lstrip('-') in ('pk', pk):
+        return order
+    return order + ['-pk' if order[-1].startswith('-') else 'pk']
+
+
+def aligned(left, right):
+    """
+    Two pipe columns read in primary key order, when neither is ordered, so
+    they pair up row by row. Grouped, distinct and sliced columns are left
+    as they are.
+    """
+    if is_values_list(left) and is_values_list(right):
+        return [v.order_by('pk') if can_order_by_pk(v) else v for v in (left, right)]
+    return left, right
+
+
+def can_order_by_pk(queryset):
+    query = queryset.query
+    return not queryset.ordered and not query.is_sliced and not query.distinct and \
+        query.group_by is None and queryset._result_cache is None
+
+
+def is_values_list(value):
+    # QuerySets from pipes
+    return isinstance(value, QuerySet) and \
+        value._iterable_class in (FlatValuesListIterable, ValuesListIterable)
+
+
+def as_list(row):
+    # Rows of multi-column pipes are lists, as when piped in Python
+    return list(row) if type(row) is tuple else row
+
+
+@lru_cache(maxsize=1024)
+def touches_db(node):
+    # Accessors, calls, pipes and pages (reading after's cursor row) are the
+    # only nodes that can run a query
+    return any(isinstance(n, (nodes.Accessor, nodes.Call, nodes.Pipe, nodes.Page))
+               for n in nodes.walk(node))
+
+
+class AsyncExecutor(Executor):
+    """
+    Evaluates a Program with Django's async QuerySet methods (Django 4.1+).
+    Nodes that can't run a query are evaluated synchronously, and only
+    Python functions called with a QuerySet go through sync_to_async. The
+    result of the last statement is fully fetched.
+    """
+    async def arun(self, program):
+        # Queries run in sync_to_async's thread, the guard's execute wrapper
+        # is installed on that thread's connections
+        watch = self.guard.watch()
+        await sync_to_async(watch.__enter__)()
+        try:
+            for statement in program.statements:
+                self.scope.stack.append(await self.asettle(await self.aevaluate(statement)))
+                self.check_memory()
+
+            # Assign last stack statement result as multi parser result
+            if self.scope.stack:
+                self.scope.result = await self.afetch(self.scope.stack[-1])
+        finally:
+            await sync_to_async(watch.__exit__)(None, None, None)
+
+        return self.scope.result
+
+    async def asettle(self, value):
+        if is_values_list(value):
+            return [as_list(row) for row in await self.afetch(value)]
+        return self.settle(value)
+
+    async def aeval_assign(self, node):
+        self.scope.set(node.name, await self.asettle(await self.aevaluate(node.value)))
+
+    async def aevaluate(self, node):
+        if self.guard.deadline is not None:
+            self.guard.check_time()
+        if not isinstance(node, nodes.Node) or not touches_db(node):
+            return self.evaluate(node)
+        method = getattr(self, 'aeval_' + node.kind, None)
+        if method is not None:
+            return await method(node)
+        # Evaluate the children that run queries first, the node itself
+        # then only sees their values
+        return self.evaluate(await self.resolve(node))
+
+    async def resolve(self, node):
+        if isinstance(node, nodes.Node):
+            if not touches_db(node):
+                return node
+            if isinstance(node, (nodes.Accessor, nodes.Call, nodes.Pipe, nodes.Page)):
+                return await self.aevaluate(node)
+            return type(node)(*[await self.resolve(n) for n in node])
+        elif type(node) is tuple:
+            return tuple([await self.resolve(n) for n in node])
+        return node
+
+    async def afetch(self, value):
+        # QuerySets can't be evaluated lazily by the caller in async code
+        if isinstance(value, QuerySet):
+            if issubclass(value._iterable_class, ValuesListIterable):
+                # Its aiterator() runs the query in the event loop before
+                # Django 5.0
+                rows = await sync_to_async(list)(value)
+            else:
+                rows = [row async for row in value.aiterator()]
+            self.guard.count_rows(len(rows))
+            return rows
+        elif type(value) is list:
+            return [await self.afetch(v) for v in value]
+        elif type(value) is dict:
+            return {k: await self.afetch(v) for k, v in value.items()}
+        return value
+
+    async def aeval_call(self, node):
+        if node.name in functions:
+            args = [await self.aevaluate(a) for a in node.args]
+            if len(args) == 1 and isinstance(args[0], QuerySet):
+                result = await self.acall_on_queryset(node.name, args[0])
+                if result is not None:
+                    return result
+            if any(isinstance(a, QuerySet) for a in args):
+                return await sync_to_async(functions[node.name])(*args)
+            return functions[node.name](*args)
+
+    async def acall_on_queryset(self, name, queryset):
+        if name == 'len':
+            return await queryset.acount()
+        if name in column_aggregates:
+            column = flat_column(queryset)
+            if column is not None:
+                aggregate = column_aggregates[name][0]
+                result = (await queryset.aaggregate(result=aggregate(column)))['result']
+                return aggregate_result(name, result)
+
+    async def aeval_binop(self, node):
+        # Columns from pipes are QuerySets, fetch them before operating
+        left, right = aligned(await self.aevaluate(node.left), await self.aevaluate(node.right))
+        return vector.apply(node.op, await self.afetch(left), await self.afetch(right))
+
+    aeval_compare = aeval_binop
+
+    async def aeval_equals(self, node):
+        left, right = aligned(await self.aevaluate(node.left), await self.aevaluate(node.right))
+        return vector.apply('==', await self.afetch(left), await self.afetch(right))
+
+    async def aeval_negate(self, node):
+        return vector.negate(await self.afetch(await self.aevaluate(node.operand)))
+
+    async def aeval_pipe(self, node):
+        value = await self.alazy(node.target)
+        if isinstance(node.target, nodes.Name) and isinstance(value, QuerySet) and \
+                value._result_cache is None and not is_model_queryset(value):
+            value._result_cache = await self.afetch(value)
+        key = await self.aevaluate(node.key)
+        projected = self.project(value, key)
+        if projected is not None:
+            return projected
+        return [self.pipe(l, key) for l in await self.afetch(value)]
+
+    async def aeval_accessor(self, node):
+        value = await self.aaccess(await self.aevaluate(node.target),
+                                   await self.aevaluate(node.key))
+
+        if is_model_queryset(value):
+            return await self.amodel_rows(value)
+        return value
+
+    async def aeval_page(self, node):
+        value = await self.alazy(node)
+        if isinstance(nodes.unpaged(node), nodes.Accessor) and is_model_queryset(value):
+            return await self.amodel_rows(value)
+        return value
+
+    async def amodel_rows(self, queryset):
+        names, values = row_values(queryset)
+        return [dict(zip(names, row)) for row in await self.afetch(values)]
+
+    async def alazy(self, node):
+        if isinstance(node, nodes.Accessor):
+            return await self.aaccess(await self.aevaluate(node.target),
+                                      await self.aevaluate(node.key))
+        elif isinstance(node, nodes.Page):
+            # The keyset filter reads the cursor row
+            return await sync_to_async(self.page)(await self.alazy(node.target), node)
+        return await self.aevaluate(node)
+
+    async def aaccess(self, value, key):
+        if is_values_list(value) and type(key) in (int, slice):
+            return await sync_to_async(self.index)(value, key)
+        elif isinstance(value, QuerySet):
+            value, aggregates = self.access_queryset(value, key)
+            if aggregates is not None:
+                return await value.aaggregate(*aggregates.args, **aggregates.kwargs)
+            return value
+        return self.access(value, key)
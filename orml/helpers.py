@@ -1,8 +1,10 @@
-import ply.lex as lex
+import threading
+from types import MappingProxyType
 
+from asgiref.sync import sync_to_async
 from django.contrib.contenttypes.models import ContentType
 
-from orml import lexer
+from orml.limits import Limits
 
 
 class Scope:
@@ -26,21 +28,88 @@ class App(Scope):
     def __init__(self, label):
         super(App, self).__init__()
         self.label = label
-        self.models = []
-        self.model_names = []
+        self.models = {}
 
     def add_model(self, model):
-        self.model_names.append(model.model)
-        self.models.append(model)
+        self.models[model.model] = model
         self.set(model.model, model.model_class())
 
     def is_model(self, name):
-        return name in self.model_names
+        return name in self.models
 
     def get_model(self, name):
-        for t in self.models:
-            if name == t.model:
-                return t.model_class()
+        if name in self.models:
+            return self.data[name]
+
+
+class History:
+    """
+    A snapshot's history, filtered like a model. since and until filter on
+    the run's timestamp: orml.history.vals{object_id: 5, since: "2018-01-01"}
+    """
+    lookups = {'since': 'timestamp__gte', 'until': 'timestamp__lt'}
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def filter(self, query):
+        from orml.models import Snapshot, SnapshotHistory
+
+        # A subquery rather than a join, so the (snapshot, object, time) index is searched
+        queryset = SnapshotHistory.objects.filter(
+            snapshot__in=Snapshot.objects.filter(name=self.snapshot).values('id'))
+        if type(query) is dict:
+            return queryset.filter(**{self.lookups.get(k, k): v for k, v in query.items()})
+        return queryset.filter(query)
+
+
+class HistoryScope(Scope):
+    # Every name is a snapshot's History
+    def has(self, name):
+        return True
+
+    def get(self, name):
+        return History(name)
+
+
+class Registry:
+    """
+    Process wide, read only App scopes for every ContentType. Built on first
+    use and rebuilt after migrations or ContentType changes.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.apps = None
+
+    def get_apps(self):
+        apps = self.apps
+        if apps is None:
+            with self.lock:
+                if self.apps is None:
+                    self.apps = self.build()
+                apps = self.apps
+        return apps
+
+    async def aget_apps(self):
+        if self.apps is None:
+            return await sync_to_async(self.get_apps)()
+        return self.apps
+
+    def build(self):
+        apps = {}
+        for t in ContentType.objects.all():
+            if t.app_label not in apps:
+                apps[t.app_label] = App(t.app_label)
+            apps[t.app_label].add_model(t)
+        if 'orml' in apps:
+            apps['orml'].set('history', HistoryScope())
+        return MappingProxyType(apps)
+
+    def invalidate(self, **kwargs):
+        self.apps = None
+
+
+registry = Registry()
 
 
 class MultiParser:
@@ -48,60 +117,68 @@ class MultiParser:
         # User for permissions
         self.user = user
 
+        # Execution limits
+        self.limits = Limits.for_user(user)
+
         # Scopes
         self.protected = {}
         self.public = {}
 
         # apps
-        self.content_types = ContentType.objects.all()
-        for t in self.content_types:
-            if not self.app_exists(t.app_label):
-                app = self.add_app(t.app_label)
-            else:
-                app = self.get_app(t.app_label)
-            app.add_model(t)
+        self.apps = registry.get_apps()
 
         # Execution stack and result
         self.stack = []
         self.result = None
 
-        # Yacc Parser
+        # Compiler
         self.parser = parser
 
-        # Lexer
-        self.lexer = lex.lex(module=lexer)
-        self.lexer.scope = self
-
     def app_exists(self, label):
         if label in self.protected and isinstance(self.protected[label], App):
             return True
+        if label in self.apps:
+            return True
         return False
 
     def get_app(self, label):
-        if self.app_exists(label):
+        if label in self.protected and isinstance(self.protected[label], App):
             return self.protected[label]
+        return self.apps.get(label)
 
     def add_app(self, label):
         app = App(label)
         self.protected[label] = app
         return app
 
-    def parse(self, statements):
-        if type(statements) is str:
-            statements = statements.split('\n')
-        for s in statements:
-            if not s: continue
-            self.stack.append(self.parser.parse(s, lexer=self.lexer))
+    def parse(self, statements, workers=None, profile=False, format=None):
+        return self.execute(self.parser.compile(statements), workers, profile, format)
+
+    def execute(self, program, workers=None, profile=False, format=None):
+        if profile or program.explain:
+            return program.profile(self)
+        if format == 'columnar':
+            return program.columns(self)
+        elif format is not None:
+            raise ValueError('Unknown result format: {}'.format(format))
+        return program.execute(self, workers)
+
+    async def aparse(self, statements):
+        return await self.aexecute(self.parser.compile(statements))
 
-        # Assign last stack statement result as multi parser result
-        self.result = self.stack[-1]
+    async def aexecute(self, program):
+        return await program.aexecute(self)
 
-        return self.result
+    def parse_iter(self, statements, chunk_size=2000, prepare=None):
+        return self.parser.compile(statements).iterate(self, chunk_size, prepare)
 
     def has(self, name):
         if name in self.protected:
             return True
 
+        if name in self.apps:
+            return True
+
         if name in self.public:
             return True
 
@@ -111,6 +188,9 @@ class MultiParser:
         if name in self.protected:
             return self.protected[name]
 
+        if name in self.apps:
+            return self.apps[name]
+
         if name in self.public:
             return self.public[name]
 
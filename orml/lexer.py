@@ -1,7 +1,21 @@
+reserved = {
+    'explain': 'EXPLAIN',
+    'order': 'ORDER',
+    'limit': 'LIMIT',
+    'offset': 'OFFSET',
+    'after': 'AFTER',
+}
+
+# Keywords only right after a complete expression, e.g. x order val, and
+# names anywhere else, e.g. {order: 1}
+contextual = {'ORDER', 'LIMIT', 'OFFSET', 'AFTER'}
+expression_ends = {'NAME', 'INT', 'FLOAT', 'STRING', 'RPAREN', 'RBRACKET', 'RQBRACKET'}
+
 tokens = (
-    'PIPE', 'NAME', 'COLON', 'SEMICOLON', 'COMMA', 'PERIOD', 'OR', 'AND',
+    'EXPLAIN', 'ORDER', 'LIMIT', 'OFFSET', 'AFTER', 'PIPE', 'NAME', 'COLON', 'SEMICOLON', 'COMMA', 'PERIOD', 'OR', 'AND',
     'FLOAT', 'INT', 'STRING',
     'PLUS', 'MINUS', 'TIMES', 'DIVIDE', 'EQUALS', 'ASSIGN',
+    'NE', 'LE', 'GE', 'LT', 'GT',
     'LPAREN', 'RPAREN', 'LBRACKET', 'RBRACKET', 'LQBRACKET', 'RQBRACKET',
 )
 
@@ -12,6 +26,11 @@ t_TIMES = r'\*'
 t_DIVIDE = r'/'
 t_EQUALS = r'=='
 t_ASSIGN = r'='
+t_NE = r'!='
+t_LE = r'<='
+t_GE = r'>='
+t_LT = r'<'
+t_GT = r'>'
 t_LPAREN = r'\('
 t_RPAREN = r'\)'
 t_LBRACKET = r'\['
@@ -25,7 +44,12 @@ t_PERIOD = r'\.'
 t_PIPE = r'\@'
 t_OR = r'\|'
 t_AND = r'&{2}'
-t_NAME = r'[a-zA-Z_][a-zA-Z0-9_]*'
+
+
+def t_NAME(t):
+    r'[a-zA-Z_][a-zA-Z0-9_]*'
+    t.type = reserved.get(t.value, 'NAME')
+    return t
 
 
 def t_FLOAT(t):
@@ -62,3 +86,37 @@ def t_newline(t):
 def t_error(t):
     print("Illegal character '%s'" % t.value[0])
     t.lexer.skip(1)
+
+
+class ContextLexer:
+    """
+    Wraps a PLY lexer, turning contextual keywords that don't follow a
+    complete expression back into names
+    """
+    def __init__(self, lexer):
+        self.lexer = lexer
+        self.last = None
+
+    def input(self, data):
+        self.last = None
+        self.lexer.input(data)
+
+    def token(self):
+        t = self.lexer.token()
+        if t is not None:
+            if t.type in contextual and self.last not in expression_ends:
+                t.type = 'NAME'
+            self.last = t.type
+        return t
+
+    def clone(self):
+        return ContextLexer(self.lexer.clone())
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t = self.token()
+        if t is None:
+            raise StopIteration
+        return t
@@ -0,0 +1,203 @@
+import sys
+import threading
+import time
+from array import array
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import QuerySet
+from django.utils.module_loading import import_string
+
+
+class LimitExceeded(Exception):
+    """
+    Raised when a program goes over one of its limits
+    """
+    def __init__(self, limit, value):
+        self.limit = limit
+        self.value = value
+        super(LimitExceeded, self).__init__(
+            'ORML program exceeded {} ({})'.format(limit, value))
+
+
+class Limits(namedtuple('Limits', ['max_rows', 'max_queries', 'timeout', 'max_memory'])):
+    """
+    Execution limits, None means no limit. max_rows counts rows fetched over
+    the whole program, timeout is in seconds and max_memory is the
+    approximate size of intermediate results in bytes.
+    """
+    __slots__ = ()
+
+    def __new__(cls, max_rows=None, max_queries=None, timeout=None, max_memory=None):
+        return super(Limits, cls).__new__(cls, max_rows, max_queries, timeout, max_memory)
+
+    @classmethod
+    def for_user(cls, user):
+        """
+        ORML_LIMITS, updated with what the ORML_USER_LIMITS callable returns
+        for user
+        """
+        limits = dict(getattr(settings, 'ORML_LIMITS', {}))
+        user_limits = getattr(settings, 'ORML_USER_LIMITS', None)
+        if user_limits is not None and user is not None:
+            limits.update(import_string(user_limits)(user) or {})
+        return cls(**limits)
+
+    def tighten(self, limits):
+        """
+        Limits with the lower of each of these and limits, a dict
+        """
+        values = []
+        for name, value in zip(self._fields, self):
+            other = limits.get(name)
+            if value is None or (other is not None and other < value):
+                value = other
+            values.append(value)
+        return Limits(*values)
+
+    @property
+    def active(self):
+        return any(value is not None for value in self)
+
+
+class Guard:
+    """
+    Enforces Limits while a program runs. Queries are counted, and the
+    statement timeout set, by a database execute wrapper. The timeout is
+    also checked cooperatively by the executor, which reports fetched rows
+    and intermediate results.
+    """
+    def __init__(self, limits):
+        self.limits = limits
+        self.active = limits.active
+        self.deadline = None
+        if limits.timeout is not None:
+            self.deadline = time.monotonic() + limits.timeout
+        self.queries = 0
+        self.rows = 0
+        self.lock = threading.Lock()
+
+    def check_time(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise LimitExceeded('timeout', self.limits.timeout)
+
+    def count_rows(self, rows):
+        if self.limits.max_rows is None:
+            return
+        with self.lock:
+            self.rows += rows
+            if self.rows > self.limits.max_rows:
+                raise LimitExceeded('max_rows', self.limits.max_rows)
+
+    def limit(self, rows):
+        # Counts rows as they are streamed
+        for row in rows:
+            self.check_time()
+            self.count_rows(1)
+            yield row
+
+    def remaining_rows(self):
+        if self.limits.max_rows is None:
+            return None
+        return max(self.limits.max_rows - self.rows, 0)
+
+    def check_memory(self, values):
+        if self.limits.max_memory is None:
+            return
+        if sum(approximate_size(v) for v in values) > self.limits.max_memory:
+            raise LimitExceeded('max_memory', self.limits.max_memory)
+
+    @contextmanager
+    def watch(self):
+        """
+        Installs the execute wrapper on this thread's connections
+        """
+        if not self.active:
+            yield
+            return
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.execute))
+                if self.deadline is not None:
+                    stack.callback(reset_statement_timeout, connection)
+            yield
+
+    def execute(self, execute, sql, params, many, context):
+        with self.lock:
+            self.queries += 1
+            if self.limits.max_queries is not None and \
+                    self.queries > self.limits.max_queries:
+                raise LimitExceeded('max_queries', self.limits.max_queries)
+        if self.deadline is None:
+            return execute(sql, params, many, context)
+
+        self.check_time()
+        set_statement_timeout(context['connection'], context['cursor'].cursor, self.deadline)
+        try:
+            return execute(sql, params, many, context)
+        except DatabaseError as e:
+            # Statement timeouts are database errors
+            if time.monotonic() > self.deadline:
+                raise LimitExceeded('timeout', self.limits.timeout) from e
+            raise
+
+
+def set_statement_timeout(connection, cursor, deadline):
+    """
+    Limits the next statement to the time left, where the database has a
+    statement timeout. SQLite is interrupted from its progress handler.
+    """
+    remaining = max(int((deadline - time.monotonic()) * 1000), 1)
+    if connection.vendor == 'postgresql':
+        cursor.execute('SET statement_timeout = {:d}'.format(remaining))
+    elif connection.vendor == 'mysql':
+        cursor.execute('SET SESSION max_execution_time = {:d}'.format(remaining))
+    elif connection.vendor == 'sqlite':
+        connection.connection.set_progress_handler(
+            lambda: time.monotonic() > deadline, 10000)
+
+
+def reset_statement_timeout(connection):
+    if connection.connection is None:
+        return
+    if connection.vendor == 'sqlite':
+        connection.connection.set_progress_handler(None, 0)
+        return
+
+    sql = {
+        'postgresql': 'SET statement_timeout TO DEFAULT',
+        'mysql': 'SET SESSION max_execution_time = DEFAULT',
+    }.get(connection.vendor)
+    if sql is not None:
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute(sql)
+        finally:
+            cursor.close()
+
+
+def approximate_size(value, sample=100):
+    """
+    Approximate memory used by a result in bytes, lists are sized from a
+    sample of their items
+    """
+    if isinstance(value, QuerySet):
+        value = value._result_cache
+    if value is None:
+        return 0
+    elif type(value) is array:
+        return sys.getsizeof(value)
+    elif hasattr(value, 'nbytes'):
+        return value.nbytes
+    elif isinstance(value, (list, tuple)):
+        size = sys.getsizeof(value)
+        if value:
+            items = value[:sample]
+            size += sum(approximate_size(v, 10) for v in items) * len(value) // len(items)
+        return size
+    elif isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sys.getsizeof(k) + approximate_size(v, 10) for k, v in value.items())
+    return sys.getsizeof(value)
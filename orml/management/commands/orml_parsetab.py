@@ -0,0 +1,15 @@
+import os
+
+import ply.yacc as yacc
+from django.core.management.base import BaseCommand
+
+from orml import parser
+
+
+class Command(BaseCommand):
+    help = 'Regenerates the parse tables shipped in orml/parsetab.py'
+
+    def handle(self, *args, **options):
+        yacc.yacc(module=parser, debug=False, tabmodule='orml.parsetab',
+                  outputdir=os.path.dirname(parser.__file__))
+        self.stdout.write('Parse tables are up to date')
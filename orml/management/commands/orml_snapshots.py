@@ -1,35 +1,69 @@
-import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 from django.core.management.base import BaseCommand
-from django.db.models.base import ModelBase
-from django.forms import model_to_dict
+from django.db import connections
 
-from orml.models import Snapshot, SnapshotMeta
-from orml.parser import parse
+from orml.models import Snapshot
+from orml.snapshots import group_snapshots, run_snapshots
 
 
 class Command(BaseCommand):
     help = 'Run snapshots and saves snapshot meta data'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows merged and written per batch')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of worker processes')
+        parser.add_argument('--full', action='store_true',
+                            help='Ignore watermarks and rebuild every snapshot')
+
     def handle(self, *args, **options):
-        for snapshot in Snapshot.objects.select_related('query').filter(save_meta=True):
-            try:
-                result = parse(snapshot.query.query)
-                for r in result:
-                    if isinstance(r, ModelBase):
-                        r = model_to_dict(r)
-                    snapshot_meta, created = SnapshotMeta.objects.get_or_create(
-                        content_type=snapshot.meta_content_type,
-                        object_id=r.get(snapshot.meta_object_key)
-                    )
-                    try:
-                        json_data = json.loads(snapshot_meta.json_data)
-                    except json.JSONDecodeError:
-                        json_data = {}
-                    if snapshot.namespace not in json_data:
-                        json_data[snapshot.namespace] = {}
-                    json_data[snapshot.namespace].update(r)
-                    snapshot_meta.json_data = json.dumps(json_data)
-                    snapshot_meta.save()
-            except SyntaxError:
-                print('Syntax error: #{}'.format(snapshot.query_id))
+        start = time.time()
+        groups = group_snapshots(Snapshot.objects.filter(save_meta=True).order_by('id'))
+
+        if options['workers'] > 1 and len(groups) > 1:
+            results = self.run_parallel(groups, options['workers'],
+                                        options['batch_size'], options['full'])
+        else:
+            results = []
+            for group in groups:
+                results += run_snapshots(group, options['batch_size'], options['full'])
+
+        total = 0
+        failed = []
+        for result in results:
+            if result.error:
+                failed.append(result)
+                continue
+            total += result.rows
+            self.stdout.write('{}: {} rows in {:.2f}s'.format(
+                result.name, result.rows, result.seconds))
+
+        for result in failed:
+            self.stderr.write('{} (#{}) failed:\n{}'.format(
+                result.name, result.snapshot_id, result.error))
+
+        elapsed = time.time() - start
+        self.stdout.write('{} snapshots, {} failed'.format(len(results), len(failed)))
+        self.stdout.write('{} rows in {:.2f}s ({:.0f} rows/sec)'.format(
+            total, elapsed, total / max(elapsed, 0.001)))
+
+    def run_parallel(self, groups, workers, batch_size, full):
+        # Workers are forked and open their own connections, the parent's
+        # connections must not be shared with them
+        connections.close_all()
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = None
+
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(run_snapshots, group, batch_size, full)
+                       for group in groups]
+            for future in futures:
+                results += future.result()
+        return results
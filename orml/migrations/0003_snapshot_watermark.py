@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orml', '0002_auto_20180226_2202'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snapshot',
+            name='watermark',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='snapshot',
+            name='watermark_field',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orml', '0003_snapshot_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='query',
+            name='cache_timeout',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orml', '0004_query_cache_timeout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='query',
+            name='max_rows',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='query',
+            name='timeout',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds', null=True),
+        ),
+    ]
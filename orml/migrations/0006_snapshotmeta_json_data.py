@@ -0,0 +1,57 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+
+
+def text_to_json(apps, schema_editor):
+    SnapshotMeta = apps.get_model('orml', 'SnapshotMeta')
+    batch = []
+    for meta in SnapshotMeta.objects.only('json_text').iterator(chunk_size=1000):
+        try:
+            meta.json_data = json.loads(meta.json_text) if meta.json_text else None
+        except ValueError:
+            meta.json_data = None
+        batch.append(meta)
+        if len(batch) >= 1000:
+            SnapshotMeta.objects.bulk_update(batch, ['json_data'])
+            batch = []
+    SnapshotMeta.objects.bulk_update(batch, ['json_data'])
+
+
+def json_to_text(apps, schema_editor):
+    SnapshotMeta = apps.get_model('orml', 'SnapshotMeta')
+    batch = []
+    for meta in SnapshotMeta.objects.only('json_data').iterator(chunk_size=1000):
+        if meta.json_data is not None:
+            meta.json_text = json.dumps(meta.json_data, cls=DjangoJSONEncoder)
+        batch.append(meta)
+        if len(batch) >= 1000:
+            SnapshotMeta.objects.bulk_update(batch, ['json_text'])
+            batch = []
+    SnapshotMeta.objects.bulk_update(batch, ['json_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orml', '0005_query_limits'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='snapshotmeta',
+            old_name='json_data',
+            new_name='json_text',
+        ),
+        migrations.AddField(
+            model_name='snapshotmeta',
+            name='json_data',
+            field=models.JSONField(blank=True, encoder=DjangoJSONEncoder, null=True),
+        ),
+        migrations.RunPython(text_to_json, json_to_text),
+        migrations.RemoveField(
+            model_name='snapshotmeta',
+            name='json_text',
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:01
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orml', '0006_snapshotmeta_json_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snapshot',
+            name='save_history',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='SnapshotRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started', models.DateTimeField(default=django.utils.timezone.now)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='orml.snapshot')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SnapshotHistory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('timestamp', models.DateTimeField()),
+                ('delta', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='orml.snapshotrun')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='orml.snapshot')),
+            ],
+            options={
+                'ordering': ('object_id', 'timestamp'),
+                'indexes': [models.Index(fields=['snapshot', 'object_id', 'timestamp'], name='orml_history_object_time')],
+            },
+        ),
+    ]
@@ -1,7 +1,12 @@
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from orml.utils import date
 
 
 class Query(models.Model):
@@ -9,10 +14,69 @@ class Query(models.Model):
     query = models.TextField()
     creator = models.ForeignKey(settings.AUTH_USER_MODEL,
                                 on_delete=models.CASCADE)
+    # Seconds to cache results for, results aren't cached when empty
+    cache_timeout = models.PositiveIntegerField(null=True, blank=True)
+    # Limits for this query, lower than the user's limits to apply
+    max_rows = models.PositiveIntegerField(null=True, blank=True)
+    timeout = models.PositiveIntegerField(null=True, blank=True,
+                                          help_text='Seconds')
 
     def __str__(self):
         return self.name
 
+    @property
+    def limits(self):
+        return {'max_rows': self.max_rows, 'timeout': self.timeout}
+
+    @cached_property
+    def parameters(self):
+        return list(self.queryparameter_set.all())
+
+    def bind(self, params):
+        bound = {}
+        for parameter in self.parameters:
+            value = params.get(parameter.variable, parameter.default)
+            bound[parameter.variable] = parameter.convert(value)
+        return bound
+
+    def execute(self, user=None, format=None, **params):
+        from orml import parser
+        from orml.cache import result_cache
+
+        params = self.bind(params)
+        if self.cache_timeout and result_cache.enabled:
+            return result_cache.get_or_execute(
+                self.query, params, user, self.cache_timeout,
+                lambda program: parser.execute(program, user, params, format=format,
+                                               limits=self.limits),
+                format)
+        return parser.execute(parser.compile(self.query), user, params, format=format,
+                              limits=self.limits)
+
+    def iterate(self, user=None, chunk_size=2000, **params):
+        """
+        Yields the rows of the query's last statement lazily, results are
+        never cached
+        """
+        from orml import parser
+
+        params = self.bind(params)
+        return parser.execute_iter(parser.compile(self.query), user, params, chunk_size,
+                                   limits=self.limits)
+
+    async def aexecute(self, user=None, **params):
+        from orml import parser
+        from orml.cache import result_cache
+
+        if 'parameters' not in self.__dict__:
+            self.parameters = [p async for p in self.queryparameter_set.all()]
+        params = self.bind(params)
+        if self.cache_timeout and result_cache.enabled:
+            return await result_cache.aget_or_execute(
+                self.query, params, user, self.cache_timeout,
+                lambda program: parser.aexecute(program, user, params, self.limits))
+        return await parser.aexecute(parser.compile(self.query), user, params, self.limits)
+
 
 class QueryParameter(models.Model):
     INTEGER = 0
@@ -39,6 +103,26 @@ class QueryParameter(models.Model):
     def __str__(self):
         return self.name
 
+    def convert(self, value):
+        if self.is_array:
+            if type(value) is str:
+                value = value.split(',')
+            return [self.convert_value(v) for v in value]
+        return self.convert_value(value)
+
+    def convert_value(self, value):
+        if type(value) is not str:
+            return value
+        if self.param_type == self.INTEGER:
+            return int(value)
+        elif self.param_type == self.FLOAT:
+            return float(value)
+        elif self.param_type == self.STRING:
+            return value
+        elif self.param_type == self.DATE:
+            return date(value.strip())
+        return value
+
 
 class Snapshot(models.Model):
     name = models.CharField(max_length=32)
@@ -48,6 +132,12 @@ class Snapshot(models.Model):
     meta_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE,
                                           null=True, blank=True)
     meta_object_key = models.CharField(max_length=32, null=True, blank=True)
+    # Incremental snapshots only merge rows with watermark_field past the
+    # last seen value. Watermark is stored JSON encoded.
+    watermark_field = models.CharField(max_length=64, null=True, blank=True)
+    watermark = models.TextField(null=True, blank=True)
+    # Record what changed in each run, read with orml.history.<name>
+    save_history = models.BooleanField(default=False)
 
     def __str__(self):
         return self.name
@@ -57,7 +147,31 @@ class SnapshotMeta(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     obj = GenericForeignKey('content_type', 'object_id')
-    json_data = models.TextField(blank=True, null=True)
+    # Snapshot rows by namespace, e.g. {"vals": {"id": 1, "val": 15}}
+    json_data = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
 
     class Meta:
         unique_together = (('content_type', 'object_id'),)
+
+
+class SnapshotRun(models.Model):
+    snapshot = models.ForeignKey(Snapshot, on_delete=models.CASCADE, related_name='runs')
+    started = models.DateTimeField(default=timezone.now)
+    rows = models.PositiveIntegerField(default=0)
+
+
+class SnapshotHistory(models.Model):
+    run = models.ForeignKey(SnapshotRun, on_delete=models.CASCADE)
+    snapshot = models.ForeignKey(Snapshot, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    # Time of the run, copied here for the index
+    timestamp = models.DateTimeField()
+    # Values of the snapshot row that changed in this run, removed keys are null
+    delta = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        ordering = ('object_id', 'timestamp')
+        indexes = [
+            models.Index(fields=['snapshot', 'object_id', 'timestamp'],
+                         name='orml_history_object_time'),
+        ]
@@ -0,0 +1,126 @@
+from collections import namedtuple
+
+
+class Node(object):
+    """
+    Base class for compiled ORML nodes. Nodes are immutable tuples, anything
+    in a program that isn't a Node is a literal value.
+    """
+    __slots__ = ()
+    kind = None
+
+
+class Name(Node, namedtuple('Name', ['name'])):
+    __slots__ = ()
+    kind = 'name'
+
+
+class ScopeLookup(Node, namedtuple('ScopeLookup', ['target', 'name'])):
+    __slots__ = ()
+    kind = 'scope'
+
+
+class Filter(Node, namedtuple('Filter', ['target', 'query'])):
+    __slots__ = ()
+    kind = 'filter'
+
+
+class Call(Node, namedtuple('Call', ['name', 'args'])):
+    __slots__ = ()
+    kind = 'call'
+
+
+class BinOp(Node, namedtuple('BinOp', ['op', 'left', 'right'])):
+    __slots__ = ()
+    kind = 'binop'
+
+
+class Compare(Node, namedtuple('Compare', ['op', 'left', 'right'])):
+    __slots__ = ()
+    kind = 'compare'
+
+
+class Negate(Node, namedtuple('Negate', ['operand'])):
+    __slots__ = ()
+    kind = 'negate'
+
+
+class Equals(Node, namedtuple('Equals', ['left', 'right'])):
+    __slots__ = ()
+    kind = 'equals'
+
+
+class Assign(Node, namedtuple('Assign', ['name', 'value'])):
+    __slots__ = ()
+    kind = 'assign'
+
+
+class List(Node, namedtuple('List', ['items'])):
+    __slots__ = ()
+    kind = 'list'
+
+
+class Dict(Node, namedtuple('Dict', ['items'])):
+    __slots__ = ()
+    kind = 'dict'
+
+
+class ArgsKwargs(Node, namedtuple('ArgsKwargs', ['args', 'kwargs'])):
+    __slots__ = ()
+    kind = 'argskwargs'
+
+
+class QueryChain(Node, namedtuple('QueryChain', ['left', 'right'])):
+    __slots__ = ()
+    kind = 'querychain'
+
+
+class Pipe(Node, namedtuple('Pipe', ['target', 'key'])):
+    __slots__ = ()
+    kind = 'pipe'
+
+
+class Accessor(Node, namedtuple('Accessor', ['target', 'key'])):
+    __slots__ = ()
+    kind = 'accessor'
+
+
+class Page(Node, namedtuple('Page', ['target', 'order', 'limit', 'offset', 'after'])):
+    __slots__ = ()
+    kind = 'page'
+
+
+class Explain(Node, namedtuple('Explain', ['statement'])):
+    __slots__ = ()
+    kind = 'explain'
+
+
+def unpaged(node):
+    """
+    The expression a Page, or Pages nested by parentheses, page
+    """
+    while isinstance(node, Page):
+        node = node.target
+    return node
+
+
+def names(node):
+    """
+    Every variable name read in node
+    """
+    return set(n.name for n in walk(node) if isinstance(n, Name))
+
+
+def walk(node):
+    """
+    Yields node and every node nested below it
+    """
+    if isinstance(node, Node):
+        yield node
+        for child in node:
+            for n in walk(child):
+                yield n
+    elif type(node) is tuple:
+        for child in node:
+            for n in walk(child):
+                yield n
@@ -1,34 +1,41 @@
 import ply.yacc as yacc
-import collections
 
-from django.db.models import Q, QuerySet, Avg, Sum, Aggregate, Count, Max, Min
-from django.db.models.base import ModelBase
-from django.forms import model_to_dict
-
-from orml.helpers import App, MultiParser, ArgsKwargs, Scope
+from orml import nodes
+from orml.compiler import Compiler
+from orml.executor import functions
+from orml.helpers import MultiParser, registry
 from orml.lexer import tokens
-from orml.utils import average, max_float, count_distinct, \
-    split_queryset_arguments, count_all
 
 # Parsing rules
 precedence = (
+    # Dicts, query chains and argskwargs are only reduced to expressions
+    # once no more | or , follow
+    ('nonassoc', 'CHAIN'),
     ('left',  'AND', 'OR'),
     ('left', 'COMMA', 'PERIOD',),
+    ('left', 'ORDER', 'LIMIT', 'OFFSET', 'AFTER'),
     ('left', 'COLON', 'LBRACKET', 'RBRACKET'),
+    ('nonassoc', 'NE', 'LE', 'GE', 'LT', 'GT'),
     ('left', 'PLUS', 'MINUS'),
     ('left', 'TIMES', 'DIVIDE'),
     ('left', 'SEMICOLON'),
     ('right', 'UMINUS'),
+    ('left', 'PIPE'),
 )
 
 def p_statement_equals(t):
     'statement : expression EQUALS expression'
-    t[0] = t[1] == t[3]
+    t[0] = nodes.Equals(t[1], t[3])
 
 
 def p_statement_assign(t):
     'statement : NAME ASSIGN expression'
-    t.lexer.scope.set(t[1], t[3])
+    t[0] = nodes.Assign(t[1], t[3])
+
+
+def p_statement_explain(t):
+    'statement : EXPLAIN statement'
+    t[0] = nodes.Explain(t[2])
 
 
 def p_statement_expr(t):
@@ -36,63 +43,78 @@ def p_statement_expr(t):
     t[0] = t[1]
 
 
-functions = {
-    # Aggregates
-    'Sum': Sum,
-    'Avg': Avg,
-    'Count': Count,
-    'CountAll': count_all,
-    'CountDistinct': count_distinct,
-    'Max': Max,
-    'MaxFloat': max_float,
-    'Min': Min,
-
-    # Misc functions
-    'sum': sum,
-    'average': average
-}
-
-
 def p_scope(t):
     """scope : NAME PERIOD NAME
              | scope PERIOD NAME
     """
     if type(t[1]) is str:
-        name = t[1]
-        if t.lexer.scope.has(name):
-            scope = t.lexer.scope.get(name)
-            if isinstance(scope, Scope) or isinstance(scope, dict):
-                t[0] = scope.get(t[3])
+        t[0] = nodes.ScopeLookup(nodes.Name(t[1]), t[3])
     else:
-        t[0] = t[1].get(t[3])
+        t[0] = nodes.ScopeLookup(t[1], t[3])
 
 
 def p_expression_query_filter(t):
     """expression : scope query
                   | scope dict
     """
-    if type(t[1]) is ModelBase:
-        if type(t[2]) is dict:
-            t[0] = t[1].objects.filter(**t[2])
-        else:
-            t[0] = t[1].objects.filter(t[2])
+    t[0] = nodes.Filter(t[1], t[2])
 
 
 def p_expression_func(t):
     """expression : NAME LPAREN expression RPAREN
+                  | NAME LPAREN raw_list RPAREN
                   | NAME LPAREN RPAREN
     """
-    if t[1] in functions:
-        if t[3] == ')':
-            t[0] = functions[t[1]]()
-        else:
-            t[0] = functions[t[1]](t[3])
+    if t[3] == ')':
+        t[0] = nodes.Call(t[1], ())
+    elif type(t[3]) is list:
+        t[0] = nodes.Call(t[1], tuple(t[3]))
+    else:
+        t[0] = nodes.Call(t[1], (t[3], ))
+
+
+def p_expression_order(t):
+    'expression : expression ORDER order_keys'
+    t[0] = _page(t[1], order=tuple(t[3]))
+
+
+def p_expression_limit(t):
+    """expression : expression LIMIT expression
+                  | expression OFFSET expression
+                  | expression AFTER expression
+    """
+    t[0] = _page(t[1], **{t[2]: t[3]})
+
+
+def p_order_key(t):
+    """order_key : NAME
+                 | MINUS NAME
+    """
+    t[0] = t[1] if len(t) == 2 else '-' + t[2]
+
+
+def p_order_keys(t):
+    """order_keys : order_key
+                  | LBRACKET order_key_list RBRACKET
+    """
+    t[0] = [t[1]] if len(t) == 2 else t[2]
+
+
+def p_order_key_list(t):
+    """order_key_list : order_key
+                      | order_key_list COMMA order_key
+    """
+    t[0] = [t[1]] if len(t) == 2 else t[1] + [t[3]]
 
 
 def p_expression_group(t):
     """expression : LPAREN expression RPAREN
     """
     t[0] = t[2]
+    if isinstance(t[2], nodes.Page):
+        # Clauses after the parentheses page the paged result, so
+        # (a limit 3) offset 2 isn't merged into a limit 3 offset 2
+        t[0] = nodes.Page(t[2], (), None, None, None)
 
 
 def p_expression_binop(t):
@@ -101,19 +123,22 @@ def p_expression_binop(t):
                   | expression TIMES expression
                   | expression DIVIDE expression
     '''
-    if t[2] == '+':
-        t[0] = t[1] + t[3]
-    elif t[2] == '-':
-        t[0] = t[1] - t[3]
-    elif t[2] == '*':
-        t[0] = t[1] * t[3]
-    elif t[2] == '/':
-        t[0] = t[1] / t[3]
+    t[0] = nodes.BinOp(t[2], t[1], t[3])
+
+
+def p_expression_compare(t):
+    '''expression : expression NE expression
+                  | expression LE expression
+                  | expression GE expression
+                  | expression LT expression
+                  | expression GT expression
+    '''
+    t[0] = nodes.Compare(t[2], t[1], t[3])
 
 
 def p_expression_uminus(t):
     'expression : MINUS expression %prec UMINUS'
-    t[0] = -t[2]
+    t[0] = nodes.Negate(t[2])
 
 
 def p_expression_types(t):
@@ -122,11 +147,11 @@ def p_expression_types(t):
                | INT
                | STRING
                | list
-               | dict
-               | querychain
+               | dict %prec CHAIN
+               | querychain %prec CHAIN
                | query
                | scope
-               | argskwargs
+               | argskwargs %prec CHAIN
     """
     t[0] = t[1]
 
@@ -138,13 +163,23 @@ def p_expression_accessor(t):
     t[0] = t[1]
 
 
+def p_list_piped(t):
+    """list : expression PIPE pipe_key"""
+    t[0] = nodes.Pipe(t[1], t[3])
+
+
+def p_pipe_key(t):
+    """pipe_key : NAME
+                | INT
+                | LBRACKET raw_list RBRACKET
+    """
+    # Keys can't start an expression, so a@val * 2 has a single parse
+    t[0] = t[1] if len(t) == 2 else nodes.List(tuple(t[2]))
+
+
 def p_expression_name(t):
     """expression : NAME"""
-    name = t[1]
-    if t.lexer.scope.has(name):
-        t[0] = t.lexer.scope.get(name)
-    else:
-        t[0] = name
+    t[0] = nodes.Name(t[1])
 
 
 def p_statement(t):
@@ -168,13 +203,10 @@ def p_argskwargs(t):
     """argskwargs : raw_list COMMA raw_dict
                   | argskwargs COMMA raw_dict
     """
-    if type(t[1]) is list and type(t[3]) is dict:
-        argskwargs = ArgsKwargs()
-        argskwargs.add(t[1])
+    if type(t[1]) is list:
+        t[0] = nodes.ArgsKwargs(tuple(t[1]), _dict_items(t[3]))
     else:
-        argskwargs = t[1]
-    argskwargs.add(t[3])
-    t[0] = argskwargs
+        t[0] = nodes.ArgsKwargs(t[1].args, t[1].kwargs + _dict_items(t[3]))
 
 
 def p_raw_list(t):
@@ -194,55 +226,17 @@ def p_raw_list(t):
 
 def p_list(t):
     """list : LBRACKET raw_list RBRACKET"""
-    t[0] = t[2]
-
-
-def p_list_piped(t):
-    """list : expression PIPE list
-            | expression PIPE NAME
-            | expression PIPE INT
-    """
-    if type(t[3]) is list:
-        t[0] = [[l[n] for n in t[3]] for l in t[1]]
-    elif type(t[3]) is str:
-        t[0] = [l.get(t[3]) for l in t[1]]
-    elif type(t[3]) is int:
-        t[0] = [l[t[3]] for l in t[1]]
+    t[0] = nodes.List(tuple(t[2]))
 
 
 def p_accessor(t):
     """accessor : expression LBRACKET expression RBRACKET
                 | expression LBRACKET raw_list RBRACKET
     """
-    if type(t[1]) is list and type(t[3]) is int:
-        t[0] = t[1][t[3]]
-    elif isinstance(t[1], QuerySet):
-        values, aggregate_args, aggregate_kwargs = split_queryset_arguments(t[3])
-        distinct = False
-        if len(values):
-            if 'distinct' in values:
-                values.remove('distinct')
-                t[1] = t[1].values(*values).distinct()
-                distinct = True
-            else:
-                t[1] = t[1].values(*values)
-
-        if len(aggregate_args) or len(aggregate_kwargs):
-            if distinct:
-                t[1] = t[1].annotate(*aggregate_args, **aggregate_kwargs)
-            else:
-                t[1] = t[1].aggregate(*aggregate_args, **aggregate_kwargs)
-
-        # Convert models to dicts
-        # if t[1] is still a queryset, convert all models to dicts
-        if isinstance(t[1], QuerySet) and isinstance(t[1][0], ModelBase):
-            t[0] = [model_to_dict(m) for m in t[1]]
-        else:
-            t[0] = t[1]
-    elif type(t[1]) is dict:
-        t[0] = t[1].get(t[3])
+    if type(t[3]) is list:
+        t[0] = nodes.Accessor(t[1], nodes.List(tuple(t[3])))
     else:
-        t[0] = None
+        t[0] = nodes.Accessor(t[1], t[3])
 
 
 def p_querychain(t):
@@ -251,19 +245,19 @@ def p_querychain(t):
                   | dict OR raw_dict
                   | dict OR dict
     """
-    t[0] = Q(**t[1]) | Q(**t[3])
+    t[0] = nodes.QueryChain(_as_dict(t[1]), _as_dict(t[3]))
 
 
 def p_querychain_or_dict(t):
     """querychain : querychain OR raw_dict
                   | querychain OR dict
     """
-    t[0] = t[1] | Q(**t[3])
+    t[0] = nodes.QueryChain(t[1], _as_dict(t[3]))
 
 
 def p_querychain_or_querychain(t):
     """querychain : querychain OR querychain"""
-    t[0] = t[1] | t[3]
+    t[0] = nodes.QueryChain(t[1], t[3])
 
 
 def p_query(t):
@@ -275,16 +269,79 @@ def p_query(t):
 def p_query_dict(t):
     """dict : LQBRACKET raw_dict RQBRACKET
     """
-    t[0] = t[2]
+    t[0] = nodes.Dict(_dict_items(t[2]))
 
 
 def p_error(t):
     print("Syntax error at '%s'" % t.value)
 
 
-parser = yacc.yacc()
+def _dict_items(raw_dict):
+    return tuple(raw_dict.items())
+
+
+def _page(target, **clauses):
+    # order, limit, offset and after on the same unparenthesized expression
+    # make up one Page, so they apply in SQL order whatever order they're
+    # written in
+    if not isinstance(target, nodes.Page):
+        target = nodes.Page(target, (), None, None, None)
+    return target._replace(**clauses)
+
+
+def _as_dict(d):
+    if type(d) is dict:
+        return nodes.Dict(_dict_items(d))
+    return d
+
+
+# Tables are loaded from the shipped orml/parsetab.py and never written at
+# runtime, run the orml_parsetab command after changing the grammar.
+parser = yacc.yacc(debug=False, write_tables=False)
+compiler = Compiler(parser)
+
+
+def compile(statements):
+    return compiler.compile(statements)
+
+
+def scope(user, params=None, limits=None):
+    """
+    MultiParser for user with params bound as variables. limits, a dict,
+    can lower the user's limits for this execution.
+    """
+    multiparser = MultiParser(compiler, user)
+    if params:
+        for name, value in params.items():
+            multiparser.set(name, value)
+    if limits:
+        multiparser.limits = multiparser.limits.tighten(limits)
+    return multiparser
+
+
+def execute(program, user=None, params=None, workers=None, profile=False, format=None,
+            limits=None):
+    return scope(user, params, limits).execute(program, workers, profile, format)
+
+
+def parse(statements, user=None, workers=None, profile=False, format=None, limits=None):
+    return scope(user, limits=limits).parse(statements, workers, profile, format)
+
+
+async def aexecute(program, user=None, params=None, limits=None):
+    # Builds the model registry off the event loop if needed
+    await registry.aget_apps()
+    return await scope(user, params, limits).aexecute(program)
+
+
+async def aparse(statements, user=None, limits=None):
+    return await aexecute(compile(statements), user, limits=limits)
+
+
+def execute_iter(program, user=None, params=None, chunk_size=2000, prepare=None,
+                 limits=None):
+    return program.iterate(scope(user, params, limits), chunk_size, prepare)
 
 
-def parse(statements, user=None):
-    multiparser = MultiParser(parser, user)
-    return multiparser.parse(statements)
+def parse_iter(statements, user=None, chunk_size=2000, prepare=None, limits=None):
+    return scope(user, limits=limits).parse_iter(statements, chunk_size, prepare)
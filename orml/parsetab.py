@@ -0,0 +1,96 @@
+
+# parsetab.py
+# This file is automatically generated. Do not edit.
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'nonassocCHAINleftANDORleftCOMMAPERIODleftORDERLIMITOFFSETAFTERleftCOLONLBRACKETRBRACKETnonassocNELEGELTGTleftPLUSMINUSleftTIMESDIVIDEleftSEMICOLONrightUMINUSleftPIPEEXPLAIN ORDER LIMIT OFFSET AFTER PIPE NAME COLON SEMICOLON COMMA PERIOD OR AND FLOAT INT STRING PLUS MINUS TIMES DIVIDE EQUALS ASSIGN NE LE GE LT GT LPAREN RPAREN LBRACKET RBRACKET LQBRACKET RQBRACKETstatement : expression EQUALS expressionstatement : NAME ASSIGN expressionstatement : EXPLAIN statementstatement : expressionscope : NAME PERIOD NAME\n             | scope PERIOD NAME\n    expression : scope query\n                  | scope dict\n    expression : NAME LPAREN expression RPAREN\n                  | NAME LPAREN raw_list RPAREN\n                  | NAME LPAREN RPAREN\n    expression : expression ORDER order_keysexpression : expression LIMIT expression\n                  | expression OFFSET expression\n                  | expression AFTER expression\n    order_key : NAME\n                 | MINUS NAME\n    order_keys : order_key\n                  | LBRACKET order_key_list RBRACKET\n    order_key_list : order_key\n                      | order_key_list COMMA order_key\n    expression : LPAREN expression RPAREN\n    expression : expression PLUS expression\n                  | expression MINUS expression\n                  | expression TIMES expression\n                  | expression DIVIDE expression\n    expression : expression NE expression\n                  | expression LE expression\n                  | expression GE expression\n                  | expression LT expression\n                  | expression GT expression\n    expression : MINUS expression %prec UMINUS\n    expression : FLOAT\n               | INT\n               | STRING\n               | list\n               | dict %prec CHAIN\n               | querychain %prec CHAIN\n               | query\n               | scope\n               | argskwargs %prec CHAIN\n    \n    expression : accessor\n    list : expression PIPE pipe_keypipe_key : NAME\n                | INT\n                | LBRACKET raw_list RBRACKET\n    expression : NAMEstatement : expression SEMICOLONraw_dict : NAME COLON expressionraw_dict : raw_dict COMMA raw_dictargskwargs : raw_list COMMA raw_dict\n                  | argskwargs COMMA raw_dict\n    raw_list : expression COMMA expression\n                | raw_list COMMA expression\n                | raw_list COMMA raw_list\n    list : LBRACKET raw_list RBRACKETaccessor : expression LBRACKET expression RBRACKET\n                | expression LBRACKET raw_list RBRACKET\n    querychain : raw_dict OR raw_dict\n                  | raw_dict OR dict\n                  | dict OR raw_dict\n                  | dict OR dict\n    querychain : querychain OR raw_dict\n                  | querychain OR dict\n    querychain : querychain OR querychainquery : LQBRACKET querychain RQBRACKET\n        dict : LQBRACKET raw_dict RQBRACKET\n    '
+    
+_lr_action_items = {'NAME':([0,4,8,10,18,19,21,23,24,25,26,27,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,46,47,48,51,53,54,57,62,63,67,69,85,109,126,],[3,3,50,50,50,60,50,68,50,50,50,50,50,50,50,50,50,50,50,50,83,50,50,50,50,93,50,95,60,60,103,60,60,60,60,60,68,118,50,124,68,]),'EXPLAIN':([0,4,],[4,4,]),'LPAREN':([0,3,4,8,10,18,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,50,51,85,103,109,124,],[8,40,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,40,8,8,40,8,40,]),'MINUS':([0,2,3,4,5,6,7,8,10,11,12,13,14,15,16,17,18,21,23,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,44,45,49,50,51,52,56,64,65,66,67,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,85,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,109,111,112,113,114,115,118,120,121,122,123,124,125,126,127,],[10,28,-47,10,-40,-39,-37,10,10,-33,-34,-35,-36,-38,-41,-42,10,10,69,10,10,10,10,10,10,10,10,10,10,10,10,10,10,10,10,10,-7,-8,28,-47,10,-32,28,28,-12,-18,69,-16,28,28,28,-23,-24,-25,-26,28,28,28,28,28,-43,-44,-45,10,28,28,28,28,-11,-5,28,-6,-62,-61,-22,-51,28,-47,-65,-63,-64,-52,-56,10,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,69,-46,]),'FLOAT':([0,4,8,10,18,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,51,85,109,],[11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,]),'INT':([0,4,8,10,18,21,24,25,26,27,28,29,30,31,32,33,34,35,36,37,38,39,40,42,51,85,109,],[12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,84,12,12,12,12,12,12,12,12,]),'STRING':([0,4,8,10,18,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,51,85,109,],[13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,]),'LBRACKET':([0,2,3,4,5,6,7,8,10,11,12,13,14,15,16,17,18,21,23,24,25,26,27,28,29,30,31,32,33,34,35,36,37,38,39,40,42,44,45,49,50,51,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,85,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,109,111,112,113,114,115,118,120,121,122,123,124,125,127,],[18,37,-47,18,-40,-39,-37,18,18,-33,-34,-35,-36,-38,-41,-42,18,18,67,18,18,18,18,18,18,18,18,18,18,18,18,85,18,18,18,18,18,-7,-8,37,-47,18,-32,37,37,-12,-18,-16,37,37,37,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,18,37,37,37,37,-11,-5,-49,-6,-62,-61,-22,-51,37,-47,-65,-63,-64,-52,-56,18,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'LQBRACKET':([0,4,5,8,10,18,19,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,47,48,51,53,62,85,93,95,109,],[19,19,47,19,19,19,57,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,57,57,19,57,57,19,-5,-6,19,]),'$end':([1,2,3,5,6,7,11,12,13,14,15,16,17,22,43,44,45,50,52,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,89,91,93,94,95,97,98,99,101,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,125,127,],[0,-4,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-48,-3,-7,-8,-47,-32,-1,-12,-18,-16,-13,-14,-15,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,-2,-11,-5,-49,-6,-62,-61,-22,-51,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-19,-46,]),'EQUALS':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,50,52,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,91,93,94,95,97,98,99,101,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,125,127,],[21,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,-47,-32,-12,-18,-16,-13,-14,-15,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,-11,-5,-49,-6,-62,-61,-22,-51,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-19,-46,]),'SEMICOLON':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,50,52,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,91,93,94,95,97,98,99,101,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,125,127,],[22,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,-47,-32,-12,-18,-16,-13,-14,-15,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,-11,-5,-49,-6,-62,-61,-22,-51,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-19,-46,]),'ORDER':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[23,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,23,-47,-32,23,23,-12,-18,-16,-13,-14,-15,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,23,23,23,23,-11,-5,-49,-6,-62,-61,-22,-51,23,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'LIMIT':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[24,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,24,-47,-32,24,24,-12,-18,-16,-13,-14,-15,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,24,24,24,24,-11,-5,-49,-6,-62,-61,-22,-51,24,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'OFFSET':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[25,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,25,-47,-32,25,25,-12,-18,-16,-13,-14,-15,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,25,25,25,25,-11,-5,-49,-6,-62,-61,-22,-51,25,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'AFTER':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[26,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,26,-47,-32,26,26,-12,-18,-16,-13,-14,-15,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,26,26,26,26,-11,-5,-49,-6,-62,-61,-22,-51,26,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'PLUS':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[27,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,27,-47,-32,27,27,-12,-18,-16,27,27,27,-23,-24,-25,-26,27,27,27,27,27,-43,-44,-45,27,27,27,27,-11,-5,27,-6,-62,-61,-22,-51,27,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'TIMES':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[29,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,29,-47,-32,29,29,-12,-18,-16,29,29,29,29,29,-25,-26,29,29,29,29,29,-43,-44,-45,29,29,29,29,-11,-5,29,-6,-62,-61,-22,-51,29,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'DIVIDE':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[30,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,30,-47,-32,30,30,-12,-18,-16,30,30,30,30,30,-25,-26,30,30,30,30,30,-43,-44,-45,30,30,30,30,-11,-5,30,-6,-62,-61,-22,-51,30,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'NE':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[31,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,31,-47,-32,31,31,-12,-18,-16,31,31,31,-23,-24,-25,-26,None,None,None,None,None,-43,-44,-45,31,31,31,31,-11,-5,31,-6,-62,-61,-22,-51,31,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'LE':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[32,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,32,-47,-32,32,32,-12,-18,-16,32,32,32,-23,-24,-25,-26,None,None,None,None,None,-43,-44,-45,32,32,32,32,-11,-5,32,-6,-62,-61,-22,-51,32,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'GE':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[33,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,33,-47,-32,33,33,-12,-18,-16,33,33,33,-23,-24,-25,-26,None,None,None,None,None,-43,-44,-45,33,33,33,33,-11,-5,33,-6,-62,-61,-22,-51,33,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'LT':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[34,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,34,-47,-32,34,34,-12,-18,-16,34,34,34,-23,-24,-25,-26,None,None,None,None,None,-43,-44,-45,34,34,34,34,-11,-5,34,-6,-62,-61,-22,-51,34,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'GT':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[35,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,35,-47,-32,35,35,-12,-18,-16,35,35,35,-23,-24,-25,-26,None,None,None,None,None,-43,-44,-45,35,35,35,35,-11,-5,35,-6,-62,-61,-22,-51,35,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'PIPE':([2,3,5,6,7,11,12,13,14,15,16,17,44,45,49,50,52,56,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,88,89,90,91,93,94,95,97,98,99,101,102,103,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[36,-47,-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,36,-47,36,36,36,-12,-18,-16,36,36,36,36,36,36,36,36,36,36,36,36,-43,-44,-45,36,36,36,36,-11,-5,36,-6,-62,-61,-22,-51,36,-47,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'COMMA':([2,3,5,6,7,9,11,12,13,14,15,16,17,20,44,45,49,50,52,55,56,58,64,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,87,88,89,90,91,92,93,94,95,96,97,98,99,100,101,102,103,104,105,106,107,108,110,111,112,113,114,115,116,117,118,119,120,121,122,123,124,125,127,128,],[38,-47,-40,-39,-37,51,-33,-34,-35,-36,-38,54,-42,63,-7,-8,38,-47,-32,109,38,63,38,-12,-18,-16,-13,-14,-15,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,38,109,-53,38,38,-11,109,-5,-49,-6,63,-62,63,-22,-55,-51,-54,-47,-65,63,-64,-52,-56,63,-67,-66,63,-60,-50,126,-20,-17,109,-57,-58,-9,-10,-47,-19,-46,-21,]),'ASSIGN':([3,],[39,]),'PERIOD':([3,5,50,93,95,103,124,],[41,46,41,-5,-6,41,41,]),'COLON':([3,50,60,103,124,],[42,42,42,42,42,]),'RPAREN':([5,6,7,11,12,13,14,15,16,17,40,44,45,49,50,52,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,88,90,91,92,93,94,95,97,98,99,100,101,102,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,124,125,127,],[-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,91,-7,-8,99,-47,-32,-12,-18,-16,-13,-14,-15,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,-53,122,-11,123,-5,-49,-6,-62,-61,-22,-55,-51,-54,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-47,-19,-46,]),'RBRACKET':([5,6,7,11,12,13,14,15,16,17,44,45,50,52,55,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,87,88,91,93,94,95,97,98,99,100,101,102,104,105,106,107,108,111,112,113,114,115,116,117,118,119,120,121,122,123,124,125,127,128,],[-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,-47,-32,108,-12,-18,-16,-13,-14,-15,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,120,121,-53,-11,-5,-49,-6,-62,-61,-22,-55,-51,-54,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,125,-20,-17,127,-57,-58,-9,-10,-47,-19,-46,-21,]),'OR':([5,6,7,11,12,13,14,15,16,17,20,44,45,50,52,58,59,61,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,91,93,94,95,96,97,98,99,101,104,105,106,107,108,111,112,113,114,115,118,120,121,122,123,125,127,],[-40,-39,48,-33,-34,-35,-36,53,-41,-42,62,-7,-8,-47,-32,62,53,48,-12,-18,-16,-13,-14,-15,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,-11,-5,-49,-6,62,-62,-61,-22,-51,-65,-63,-64,-52,-56,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-19,-46,]),'RQBRACKET':([5,6,7,11,12,13,14,15,16,17,44,45,50,52,58,59,65,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,91,93,94,95,96,97,98,99,101,104,105,106,107,108,110,111,112,113,114,115,118,120,121,122,123,125,127,],[-40,-39,-37,-33,-34,-35,-36,-38,-41,-42,-7,-8,-47,-32,111,112,-12,-18,-16,-13,-14,-15,-23,-24,-25,-26,-27,-28,-29,-30,-31,-43,-44,-45,-11,-5,-49,-6,111,-62,-61,-22,-51,-65,-63,-64,-52,-56,111,-67,-66,-59,-60,-50,-17,-57,-58,-9,-10,-19,-46,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'statement':([0,4,],[1,43,]),'expression':([0,4,8,10,18,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,51,85,109,],[2,2,49,52,56,64,70,71,72,73,74,75,76,77,78,79,80,81,86,88,89,90,94,102,56,102,]),'scope':([0,4,8,10,18,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,51,85,109,],[5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,]),'query':([0,4,5,8,10,18,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,51,85,109,],[6,6,44,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,]),'dict':([0,4,5,8,10,18,19,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,47,48,51,53,62,85,109,],[7,7,45,7,7,7,61,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,61,97,7,106,114,7,7,]),'raw_list':([0,4,8,10,18,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,51,85,109,],[9,9,9,9,55,9,9,9,9,9,9,9,9,9,9,9,9,9,87,9,9,92,9,100,119,100,]),'list':([0,4,8,10,18,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,51,85,109,],[14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,]),'querychain':([0,4,8,10,18,19,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,47,51,53,85,109,],[15,15,15,15,15,59,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,59,15,104,15,15,]),'argskwargs':([0,4,8,10,18,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,51,85,109,],[16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,]),'accessor':([0,4,8,10,18,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,51,85,109,],[17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,]),'raw_dict':([0,4,8,10,18,19,21,24,25,26,27,28,29,30,31,32,33,34,35,37,38,39,40,42,47,48,51,53,54,57,62,63,85,109,],[20,20,20,20,20,58,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,96,98,101,105,107,110,113,115,20,101,]),'order_keys':([23,],[65,]),'order_key':([23,67,126,],[66,117,128,]),'pipe_key':([36,],[82,]),'order_key_list':([67,],[116,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> statement","S'",1,None,None,None),
+  ('statement -> expression EQUALS expression','statement',3,'p_statement_equals','parser.py',27),
+  ('statement -> NAME ASSIGN expression','statement',3,'p_statement_assign','parser.py',32),
+  ('statement -> EXPLAIN statement','statement',2,'p_statement_explain','parser.py',37),
+  ('statement -> expression','statement',1,'p_statement_expr','parser.py',42),
+  ('scope -> NAME PERIOD NAME','scope',3,'p_scope','parser.py',47),
+  ('scope -> scope PERIOD NAME','scope',3,'p_scope','parser.py',48),
+  ('expression -> scope query','expression',2,'p_expression_query_filter','parser.py',57),
+  ('expression -> scope dict','expression',2,'p_expression_query_filter','parser.py',58),
+  ('expression -> NAME LPAREN expression RPAREN','expression',4,'p_expression_func','parser.py',64),
+  ('expression -> NAME LPAREN raw_list RPAREN','expression',4,'p_expression_func','parser.py',65),
+  ('expression -> NAME LPAREN RPAREN','expression',3,'p_expression_func','parser.py',66),
+  ('expression -> expression ORDER order_keys','expression',3,'p_expression_order','parser.py',77),
+  ('expression -> expression LIMIT expression','expression',3,'p_expression_limit','parser.py',82),
+  ('expression -> expression OFFSET expression','expression',3,'p_expression_limit','parser.py',83),
+  ('expression -> expression AFTER expression','expression',3,'p_expression_limit','parser.py',84),
+  ('order_key -> NAME','order_key',1,'p_order_key','parser.py',90),
+  ('order_key -> MINUS NAME','order_key',2,'p_order_key','parser.py',91),
+  ('order_keys -> order_key','order_keys',1,'p_order_keys','parser.py',97),
+  ('order_keys -> LBRACKET order_key_list RBRACKET','order_keys',3,'p_order_keys','parser.py',98),
+  ('order_key_list -> order_key','order_key_list',1,'p_order_key_list','parser.py',104),
+  ('order_key_list -> order_key_list COMMA order_key','order_key_list',3,'p_order_key_list','parser.py',105),
+  ('expression -> LPAREN expression RPAREN','expression',3,'p_expression_group','parser.py',111),
+  ('expression -> expression PLUS expression','expression',3,'p_expression_binop','parser.py',117),
+  ('expression -> expression MINUS expression','expression',3,'p_expression_binop','parser.py',118),
+  ('expression -> expression TIMES expression','expression',3,'p_expression_binop','parser.py',119),
+  ('expression -> expression DIVIDE expression','expression',3,'p_expression_binop','parser.py',120),
+  ('expression -> expression NE expression','expression',3,'p_expression_compare','parser.py',126),
+  ('expression -> expression LE expression','expression',3,'p_expression_compare','parser.py',127),
+  ('expression -> expression GE expression','expression',3,'p_expression_compare','parser.py',128),
+  ('expression -> expression LT expression','expression',3,'p_expression_compare','parser.py',129),
+  ('expression -> expression GT expression','expression',3,'p_expression_compare','parser.py',130),
+  ('expression -> MINUS expression','expression',2,'p_expression_uminus','parser.py',136),
+  ('expression -> FLOAT','expression',1,'p_expression_types','parser.py',142),
+  ('expression -> INT','expression',1,'p_expression_types','parser.py',143),
+  ('expression -> STRING','expression',1,'p_expression_types','parser.py',144),
+  ('expression -> list','expression',1,'p_expression_types','parser.py',145),
+  ('expression -> dict','expression',1,'p_expression_types','parser.py',146),
+  ('expression -> querychain','expression',1,'p_expression_types','parser.py',147),
+  ('expression -> query','expression',1,'p_expression_types','parser.py',148),
+  ('expression -> scope','expression',1,'p_expression_types','parser.py',149),
+  ('expression -> argskwargs','expression',1,'p_expression_types','parser.py',150),
+  ('expression -> accessor','expression',1,'p_expression_accessor','parser.py',157),
+  ('list -> expression PIPE pipe_key','list',3,'p_list_piped','parser.py',163),
+  ('pipe_key -> NAME','pipe_key',1,'p_pipe_key','parser.py',168),
+  ('pipe_key -> INT','pipe_key',1,'p_pipe_key','parser.py',169),
+  ('pipe_key -> LBRACKET raw_list RBRACKET','pipe_key',3,'p_pipe_key','parser.py',170),
+  ('expression -> NAME','expression',1,'p_expression_name','parser.py',177),
+  ('statement -> expression SEMICOLON','statement',2,'p_statement','parser.py',182),
+  ('raw_dict -> NAME COLON expression','raw_dict',3,'p_raw_dict','parser.py',187),
+  ('raw_dict -> raw_dict COMMA raw_dict','raw_dict',3,'p_raw_dict_chain','parser.py',193),
+  ('argskwargs -> raw_list COMMA raw_dict','argskwargs',3,'p_argskwargs','parser.py',199),
+  ('argskwargs -> argskwargs COMMA raw_dict','argskwargs',3,'p_argskwargs','parser.py',200),
+  ('raw_list -> expression COMMA expression','raw_list',3,'p_raw_list','parser.py',209),
+  ('raw_list -> raw_list COMMA expression','raw_list',3,'p_raw_list','parser.py',210),
+  ('raw_list -> raw_list COMMA raw_list','raw_list',3,'p_raw_list','parser.py',211),
+  ('list -> LBRACKET raw_list RBRACKET','list',3,'p_list','parser.py',224),
+  ('accessor -> expression LBRACKET expression RBRACKET','accessor',4,'p_accessor','parser.py',229),
+  ('accessor -> expression LBRACKET raw_list RBRACKET','accessor',4,'p_accessor','parser.py',230),
+  ('querychain -> raw_dict OR raw_dict','querychain',3,'p_querychain','parser.py',239),
+  ('querychain -> raw_dict OR dict','querychain',3,'p_querychain','parser.py',240),
+  ('querychain -> dict OR raw_dict','querychain',3,'p_querychain','parser.py',241),
+  ('querychain -> dict OR dict','querychain',3,'p_querychain','parser.py',242),
+  ('querychain -> querychain OR raw_dict','querychain',3,'p_querychain_or_dict','parser.py',248),
+  ('querychain -> querychain OR dict','querychain',3,'p_querychain_or_dict','parser.py',249),
+  ('querychain -> querychain OR querychain','querychain',3,'p_querychain_or_querychain','parser.py',255),
+  ('query -> LQBRACKET querychain RQBRACKET','query',3,'p_query','parser.py',260),
+  ('dict -> LQBRACKET raw_dict RQBRACKET','dict',3,'p_query_dict','parser.py',266),
+]
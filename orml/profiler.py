@@ -0,0 +1,122 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.db.models import QuerySet
+
+from orml import nodes
+from orml.executor import Executor
+
+
+class QueryLog:
+    """
+    Database execute wrapper recording the SQL and time of every query
+    """
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'time': time.perf_counter() - start,
+            })
+
+
+class ProfilingExecutor(Executor):
+    """
+    Runs a program statement by statement and returns a profile instead of
+    the result: compile, eval and database time per statement, the SQL each
+    one issued and the database's EXPLAIN of its QuerySet. The result of the
+    last statement is fetched so its query is part of the profile.
+    """
+    def __init__(self, scope):
+        super(ProfilingExecutor, self).__init__(scope)
+        self.querysets = []
+
+    def run(self, program, workers=None):
+        start = time.perf_counter()
+        timings = self.scope.parser.timings(program.source)
+        groups = dict((g[0], g) for g in program.aggregate_groups)
+
+        statements = []
+        explained = []
+        with self.guard.watch():
+            for i, statement in enumerate(program.statements):
+                self.querysets = []
+                log = QueryLog()
+                started = time.perf_counter()
+                with ExitStack() as stack:
+                    for connection in connections.all():
+                        stack.enter_context(connection.execute_wrapper(log))
+                    if i in groups:
+                        self.fuse_aggregates([program.statements[j] for j in groups[i]])
+                    value = self.settle(self.evaluate(statement))
+                    if isinstance(statement, nodes.Assign):
+                        value = self.scope.get(statement.name)
+                    elif i == len(program.statements) - 1 and isinstance(value, QuerySet):
+                        if self.guard.active:
+                            self.querysets.append(value)
+                            value = self.fetch(value)
+                        else:
+                            len(value)
+                elapsed = time.perf_counter() - started
+                db = sum(q['time'] for q in log.queries)
+
+                self.scope.stack.append(None if isinstance(statement, nodes.Assign) else value)
+                statements.append({
+                    'source': program.source[i],
+                    'lex': timings[i][0],
+                    'parse': timings[i][1],
+                    'eval': max(elapsed - db, 0),
+                    'db': db,
+                    'query_count': len(log.queries),
+                    'queries': log.queries,
+                    'rows': self.count_rows(value),
+                })
+                explained.append(self.explained_queryset(value))
+
+        # Explained outside the limits, the EXPLAIN queries aren't the program's
+        for statement, queryset in zip(statements, explained):
+            statement['explain'] = self.explain(queryset)
+
+        if self.scope.stack:
+            self.scope.result = self.scope.stack[-1]
+
+        return {
+            'result': self.scope.result,
+            'time': time.perf_counter() - start,
+            'statements': statements,
+        }
+
+    def access_queryset(self, queryset, key):
+        queryset, aggregates = super(ProfilingExecutor, self).access_queryset(queryset, key)
+        self.querysets.append(queryset)
+        return queryset, aggregates
+
+    def count_rows(self, value):
+        if isinstance(value, QuerySet):
+            if value._result_cache is not None:
+                return len(value._result_cache)
+            return None
+        elif type(value) is list:
+            return len(value)
+        elif type(value) is dict:
+            return 1
+        return None
+
+    def explained_queryset(self, value):
+        if isinstance(value, QuerySet):
+            return value
+        return self.querysets[-1] if self.querysets else None
+
+    def explain(self, queryset):
+        if queryset is None:
+            return None
+        try:
+            return queryset.explain()
+        except Exception as e:
+            return 'Explain failed: {}'.format(e)
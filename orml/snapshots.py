@@ -0,0 +1,184 @@
+import json
+import time
+import traceback
+from collections import namedtuple, OrderedDict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Value
+from django.db.models.fields.json import KeyTransform
+
+from orml.models import Snapshot, SnapshotMeta, SnapshotRun, SnapshotHistory
+from orml.parser import parse_iter
+from orml.utils import JSONMerge
+
+
+SnapshotResult = namedtuple('SnapshotResult',
+                            ['snapshot_id', 'name', 'rows', 'seconds', 'error'])
+
+
+class Watermark:
+    """
+    Limits a snapshot's QuerySet to rows with watermark_field past the last
+    run's high-water mark, and records the new mark before the rows are read.
+    """
+    def __init__(self, snapshot, full=False):
+        self.field = snapshot.watermark_field
+        self.last = None
+        if snapshot.watermark and not full:
+            self.last = json.loads(snapshot.watermark)
+        self.value = self.last
+
+    def prepare(self, queryset):
+        self.value = queryset.aggregate(watermark=Max(self.field))['watermark']
+        if self.value is None:
+            return queryset.none()
+        queryset = queryset.filter(**{self.field + '__lte': self.value})
+        if self.last is not None:
+            queryset = queryset.filter(**{self.field + '__gt': self.last})
+        return queryset
+
+    def save(self, snapshot):
+        if self.value is None:
+            return
+        snapshot.watermark = json.dumps(self.value, cls=DjangoJSONEncoder)
+        snapshot.save(update_fields=['watermark'])
+
+
+def save_snapshot_meta(snapshot, batch_size=1000, full=False):
+    """
+    Streams the snapshot query and merges every row into the SnapshotMeta of
+    its object, one batch at a time. Returns the number of rows merged.
+    """
+    prepare = watermark = run = None
+    if snapshot.save_history:
+        run = SnapshotRun.objects.create(snapshot=snapshot)
+    if snapshot.watermark_field:
+        watermark = Watermark(snapshot, full)
+        prepare = watermark.prepare
+
+    count = 0
+    batch = []
+    for row in parse_iter(snapshot.query.query, chunk_size=batch_size,
+                          prepare=prepare):
+        if row.get(snapshot.meta_object_key) is None:
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            count += merge_batch(snapshot, batch, batch_size, run)
+            batch = []
+    if batch:
+        count += merge_batch(snapshot, batch, batch_size, run)
+
+    if watermark is not None:
+        watermark.save(snapshot)
+    if run is not None:
+        run.rows = count
+        run.save(update_fields=['rows'])
+    return count
+
+
+def merge_batch(snapshot, rows, batch_size, run=None):
+    """
+    Merges rows into the snapshot's namespace of each object's SnapshotMeta.
+    Existing rows are merged into in the database, the rest of their data is
+    never read, and keys of other snapshots sharing the namespace are kept.
+    With a run, what changed in the namespace is recorded as SnapshotHistory.
+    """
+    data = OrderedDict()
+    for r in rows:
+        data.setdefault(r[snapshot.meta_object_key], {}).update(r)
+
+    queryset = SnapshotMeta.objects.filter(
+        content_type=snapshot.meta_content_type,
+        object_id__in=data.keys()
+    )
+    if run is None:
+        existing = dict(queryset.values_list('object_id', 'pk'))
+    else:
+        previous = {}
+        existing = {}
+        for object_id, pk, values in queryset.values_list(
+                'object_id', 'pk', KeyTransform(snapshot.namespace, 'json_data')):
+            existing[object_id] = pk
+            previous[object_id] = values
+        save_history(snapshot, run, data, previous, batch_size)
+
+    field = SnapshotMeta._meta.get_field('json_data')
+    created = []
+    updated = []
+    for object_id, values in data.items():
+        if object_id in existing:
+            updated.append(SnapshotMeta(
+                id=existing[object_id],
+                content_type=snapshot.meta_content_type,
+                object_id=object_id,
+                json_data=JSONMerge('json_data', snapshot.namespace,
+                                    Value(values, output_field=field))
+            ))
+        else:
+            created.append(SnapshotMeta(
+                content_type=snapshot.meta_content_type,
+                object_id=object_id,
+                json_data={snapshot.namespace: values}
+            ))
+
+    SnapshotMeta.objects.bulk_create(created, batch_size=batch_size)
+    SnapshotMeta.objects.bulk_update(updated, ['json_data'], batch_size=batch_size)
+    return len(rows)
+
+
+def changes(previous, values):
+    """
+    Keys of values that differ from previous, compared as stored in JSON.
+    Keys missing from values are left as they are by the merge, so they
+    aren't changes, and a null value is the same as a missing key.
+    """
+    values = json.loads(json.dumps(values, cls=DjangoJSONEncoder))
+    previous = previous or {}
+    return {k: v for k, v in values.items() if previous.get(k) != v}
+
+
+def save_history(snapshot, run, data, previous, batch_size):
+    history = []
+    for object_id, values in data.items():
+        delta = changes(previous.get(object_id), values)
+        if delta:
+            history.append(SnapshotHistory(
+                run=run, snapshot=snapshot, object_id=object_id,
+                timestamp=run.started, delta=delta
+            ))
+    SnapshotHistory.objects.bulk_create(history, batch_size=batch_size)
+
+
+def group_snapshots(snapshots):
+    """
+    Groups snapshot ids by meta content type. Snapshots in a group merge into
+    the same SnapshotMeta rows, so a group is always run by a single worker.
+    """
+    groups = OrderedDict()
+    for snapshot in snapshots:
+        groups.setdefault(snapshot.meta_content_type_id, []).append(snapshot.id)
+    return list(groups.values())
+
+
+def run_snapshots(snapshot_ids, batch_size=1000, full=False):
+    """
+    Runs snapshots one after another, each in its own transaction. A failing
+    snapshot is rolled back and reported without stopping the others.
+    """
+    snapshots = Snapshot.objects.select_related('query').in_bulk(snapshot_ids)
+    results = []
+    for snapshot_id in snapshot_ids:
+        snapshot = snapshots[snapshot_id]
+        start = time.time()
+        try:
+            with transaction.atomic():
+                rows = save_snapshot_meta(snapshot, batch_size, full)
+            error = None
+        except Exception:
+            rows = 0
+            error = traceback.format_exc()
+        results.append(SnapshotResult(
+            snapshot.id, snapshot.name, rows, time.time() - start, error))
+    return results
@@ -1,9 +1,34 @@
-from unittest import skip
+import json
+import os
+import threading
+from io import StringIO
+from unittest import mock, skip, skipIf
 
-from django.test import TestCase
+import ply.yacc as yacc
 
-from orml import parser
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import PermissionDenied
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.urls import reverse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from orml import parser, parsetab, vector
+from orml.cache import result_cache, referenced_models
+from orml.columnar import ColumnBuilder
+from orml.helpers import registry
+from orml.limits import Guard, LimitExceeded, Limits
+from orml.models import Query, QueryParameter, Snapshot, SnapshotMeta, SnapshotHistory
+from orml.snapshots import SnapshotResult, group_snapshots, save_snapshot_meta
 from orml.tests.models import TestModel, TestModelChild
+from orml.views import QueryExport
+
+
+def staff_limits(user):
+    return {'max_rows': None} if user.is_staff else {}
 
 
 class TestORML(TestCase):
@@ -84,6 +109,20 @@ class TestORML(TestCase):
         model = parser.parse('tests.testmodel')
         self.assertEqual(TestModel, model)
 
+    def test_model_registry(self):
+        parser.parse('tests.testmodel')
+        apps = registry.get_apps()
+        self.assertIs(apps, registry.get_apps())
+        self.assertTrue(apps['tests'].is_model('testmodelchild'))
+        self.assertEqual(apps['tests'].get_model('testmodelchild'), TestModelChild)
+
+        # Resolving models doesn't query ContentType once the registry is built
+        with self.assertNumQueries(0):
+            self.assertEqual(parser.parse('tests.testmodelchild'), TestModelChild)
+
+        ContentType.objects.get_for_model(TestModel).save()
+        self.assertIsNot(apps, registry.get_apps())
+
     def test_querychain(self):
         a = parser.parse('{id:3} | {val:15, id:2} | {id:1}')
 
@@ -254,3 +293,801 @@ class TestORML(TestCase):
             else:
                 self.assertEqual(r['avg'], 50.0)
                 self.assertEqual(r['count'], 1)
+
+    def test_accessor_query_count(self):
+        self.assertEqual(parser.parse('tests.testmodel{t: 0}[5]'), [])
+        self.assertEqual(list(parser.parse('tests.testmodel{t: 0}[id, val]')), [])
+
+        TestModel.objects.create(t=TestModel.T1, val=10, note='Test Model 1')
+        TestModel.objects.create(t=TestModel.T1, val=20, note='Test Model 2')
+
+        with self.assertNumQueries(1):
+            rows = parser.parse('tests.testmodel{t: 0}[5]')
+            self.assertEqual(rows[1]['val'], 20)
+
+        with self.assertNumQueries(1):
+            rows = list(parser.parse('tests.testmodel{t: 0}[id, val]'))
+            self.assertEqual(rows[0]['val'], 10)
+
+    def test_piped_queryset(self):
+        for i in range(3):
+            TestModel.objects.create(t=TestModel.T1, val=i, note='Test Model')
+
+        with self.assertNumQueries(1):
+            vals = list(parser.parse('tests.testmodel{t: 0}@val'))
+        self.assertEqual(sorted(vals), [0, 1, 2])
+
+        with self.assertNumQueries(1):
+            rows = list(parser.parse('tests.testmodel{t: 0}[id, val, note]@[val, note]'))
+        self.assertEqual(sorted(rows)[2], [2, 'Test Model'])
+
+        with CaptureQueriesContext(connection) as queries:
+            list(parser.parse('tests.testmodel{t: 0}@val'))
+        self.assertNotIn('"note"', queries[0]['sql'])
+
+        # Results and variables are lists, indexing a pipe used inline runs in SQL
+        self.assertEqual(parser.parse('tests.testmodel{t: 0}@val'), [0, 1, 2])
+        self.assertEqual(json.loads(json.dumps(parser.parse(
+            'tests.testmodel{t: 0}[id, val, note]@[val, note]')))[0], [0, 'Test Model'])
+        self.assertEqual(parser.parse(['x = tests.testmodel{t: 0}[id, val]@val', 'x[0]']), 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(parser.parse('(tests.testmodel{t: 0}@val)[1]'), 1)
+        self.assertEqual(parser.parse('(tests.testmodel{t: 0}@[id, val])[-1]')[1], 2)
+
+        # Lists are still piped in Python
+        self.assertEqual(parser.parse('[{a:1,b:2}, {a:3,b:4}]@b'), [2, 4])
+
+    def test_queryset_functions(self):
+        self.assertEqual(parser.parse('sum(tests.testmodel{t: 0}@val)'), 0)
+        self.assertEqual(parser.parse('average(tests.testmodel{t: 0}@val)'), 0)
+
+        for i in range(4):
+            TestModel.objects.create(t=TestModel.T1, val=i * 10, note='Test Model')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(parser.parse('sum(tests.testmodel{t: 0}@val)'), 60)
+            self.assertEqual(parser.parse('average(tests.testmodel{t: 0}@val)'), 15)
+            self.assertEqual(parser.parse('len(tests.testmodel{t: 0})'), 4)
+        self.assertEqual(len(queries), 3)
+        self.assertIn('SUM(', queries[0]['sql'])
+        self.assertIn('AVG(', queries[1]['sql'])
+        self.assertIn('COUNT(', queries[2]['sql'])
+
+        self.assertEqual(parser.parse('len([1,2,3])'), 3)
+
+    async def test_aparse(self):
+        for i in range(4):
+            await TestModel.objects.acreate(t=i % 2, val=i * 10, note='Test Model')
+
+        self.assertEqual(await parser.aparse('5*2'), 10)
+        rows = await parser.aparse('tests.testmodel{t: 0}[id, val]')
+        self.assertEqual([r['val'] for r in rows], [0, 20])
+        self.assertEqual(len(await parser.aparse('tests.testmodel{t: 1}[5]')), 2)
+        self.assertEqual(await parser.aparse('sum(tests.testmodel{t: 1}@val)'), 40)
+        self.assertEqual(await parser.aparse('len(tests.testmodel{t: 1})'), 2)
+        self.assertEqual(list(await parser.aparse('tests.testmodel{t: 1}@val * 2')), [20, 60])
+        rows = await parser.aparse('tests.testmodel{t: 1}[5] order -val after 4')
+        self.assertEqual([r['val'] for r in rows], [10])
+        rows = await parser.aparse('tests.testmodel{t: 1} order -val after 4')
+        self.assertEqual([r.val for r in rows], [10])
+
+        a = await parser.aparse([
+            'a = tests.testmodel{t: 0}[{total: Sum(val)}]',
+            'b = tests.testmodel{t: 1}[{total: Sum(val)}]',
+            '{both: a.total + b.total, vals: (tests.testmodel{t: 0}@val)}',
+        ])
+        self.assertEqual(a['both'], 60)
+        self.assertEqual(list(a['vals']), [0, 20])
+        with self.assertRaises(LimitExceeded):
+            await parser.aparse(['a = len(tests.testmodel{t: 0})', 'a + len(tests.testmodel{t: 1})'],
+                                limits={'max_queries': 1})
+
+        user = await get_user_model().objects.acreate(username='orml')
+        query = await Query.objects.acreate(
+            name='vals', creator=user, query='tests.testmodel{t: kind}[Sum(val)]')
+        await QueryParameter.objects.acreate(
+            query=query, name='Kind', variable='kind', default='0',
+            param_type=QueryParameter.INTEGER)
+        self.assertEqual((await query.aexecute(kind='1'))['val__sum'], 40)
+
+    def test_statement_dependencies(self):
+        program = parser.compile([
+            'a = tests.testmodel{t: 0}[{total: Sum(val)}]',
+            'b = tests.testmodel{t: 1}[{total: Sum(val)}]',
+            'c = a.total + b.total',
+            'a = 5',
+            '{a: a, c: c}',
+        ])
+        self.assertEqual(program.dependencies, [
+            set(), set(), {0, 1}, {0, 2}, {0, 2, 3}
+        ])
+
+    def test_fused_aggregates(self):
+        for i in range(4):
+            TestModel.objects.create(t=i % 2, val=i * 10, note='Test Model')
+
+        statements = [
+            'x = tests.testmodel{t: 0}[Avg(val)]',
+            'y = tests.testmodel{t: 0}[Max(val), Min(val), n: Count(id)]',
+            'z = tests.testmodel{t: 1}[{total: Sum(val)}]',
+            'w = tests.testmodel{t: 0}[{total: Sum(val)}]',
+            '{x: x, y: y, z: z, w: w}',
+        ]
+        self.assertEqual(parser.compile(statements).aggregate_groups, [[0, 1, 3]])
+        with self.assertNumQueries(2):
+            a = parser.parse(statements)
+        self.assertEqual(a, {
+            'x': {'val__avg': 10},
+            'y': {'val__max': 20, 'val__min': 0, 'n': 2},
+            'z': {'total': 40},
+            'w': {'total': 20},
+        })
+
+        # Filters reading a reassigned name aren't fused
+        program = parser.compile([
+            'k = 0',
+            'x = tests.testmodel{t: k}[Avg(val)]',
+            'k = 1',
+            'y = tests.testmodel{t: k}[Avg(val)]',
+            '[x, y]',
+        ])
+        self.assertEqual(program.aggregate_groups, [])
+        self.assertEqual(parser.execute(program), [{'val__avg': 10}, {'val__avg': 20}])
+
+    def test_profile(self):
+        for i in range(4):
+            TestModel.objects.create(t=i % 2, val=i * 10, note='Test Model')
+
+        statements = [
+            'a = tests.testmodel{t: 0}[{total: Sum(val)}]',
+            'tests.testmodel{t: 1}[id, val]',
+        ]
+        profile = parser.parse(statements, profile=True)
+        self.assertEqual([r['val'] for r in profile['result']], [10, 30])
+        self.assertEqual(len(profile['statements']), 2)
+
+        first, last = profile['statements']
+        self.assertEqual(first['source'], statements[0])
+        self.assertEqual(first['query_count'], 1)
+        self.assertIn('SUM(', first['queries'][0]['sql'])
+        self.assertEqual(first['rows'], 1)
+        self.assertTrue(first['explain'])
+        self.assertEqual(last['query_count'], 1)
+        self.assertEqual(last['rows'], 2)
+        for key in ('lex', 'parse', 'eval', 'db'):
+            self.assertGreaterEqual(last[key], 0)
+
+        # explain prefix
+        profile = parser.parse(['a = 5', 'explain tests.testmodel{t: 1}@val'])
+        self.assertEqual(list(profile['result']), [10, 30])
+        self.assertEqual(profile['statements'][1]['query_count'], 1)
+        self.assertEqual(parser.parse('explain 5*2')['result'], 10)
+
+    def test_parse_iter(self):
+        for i in range(5):
+            TestModel.objects.create(t=TestModel.T1, val=i, note='Test Model')
+
+        rows = parser.parse_iter('tests.testmodel{t: 0}', chunk_size=2)
+        self.assertFalse(isinstance(rows, list))
+        rows = list(rows)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['note'], 'Test Model')
+
+        vals = parser.parse_iter('tests.testmodel{t: 0}@val', chunk_size=2)
+        self.assertEqual(sorted(vals), [0, 1, 2, 3, 4])
+
+        vals = parser.parse_iter([
+            'a = tests.testmodel{val__gte: 3}[id, val]',
+            'a@[val, id]'
+        ])
+        self.assertEqual(sorted(v[0] for v in vals), [3, 4])
+
+        self.assertEqual(list(parser.parse_iter('[1,2,3]')), [1, 2, 3])
+        self.assertEqual(list(parser.parse_iter('5')), [5])
+
+    def test_columnar(self):
+        for i in range(5):
+            TestModel.objects.create(t=TestModel.T1, val=i, note='Test Model')
+        TestModel.objects.create(t=TestModel.T2, val=10, note=None)
+
+        columns = parser.parse('tests.testmodel{t: 0}[id, val]', format='columnar')
+        self.assertEqual(list(columns.keys()), ['id', 'val'])
+        self.assertEqual(columns.length, 5)
+        self.assertEqual(list(columns['val']), [0, 1, 2, 3, 4])
+        self.assertEqual(columns.row(-1)['val'], 4)
+        self.assertEqual([r['val'] for r in columns.rows()], [0, 1, 2, 3, 4])
+
+        # Models are read with values_list, strings and nulls are objects
+        columns = parser.parse('tests.testmodel{val__gte: 0}[5]', format='columnar')
+        self.assertEqual(set(columns.keys()), {'id', 't', 'val', 'note'})
+        self.assertEqual(list(columns['note'])[-2:], ['Test Model', None])
+
+        columns = parser.parse('tests.testmodel{t: 0}@val', format='columnar')
+        self.assertEqual(list(columns['val']), [0, 1, 2, 3, 4])
+
+        columns = parser.parse('tests.testmodel{t: 0}[{total: Sum(val)}]', format='columnar')
+        self.assertEqual(list(columns['total']), [10])
+        self.assertEqual(list(parser.parse('[1, 2.5]', format='columnar')['value']), [1, 2.5])
+        self.assertEqual(parser.parse('5', format='columnar'), 5)
+
+        with self.assertRaises(ValueError):
+            parser.parse('5', format='rows')
+
+    def check_elementwise(self):
+        for i in range(4):
+            TestModel.objects.create(t=TestModel.T1, val=i * 10, note='Test Model')
+
+        self.assertEqual(parser.parse('[1, 2, 3] * 2 + 1'), [3, 5, 7])
+        self.assertEqual(parser.parse('[1, 2] - [3, 5]'), [-2, -3])
+        self.assertEqual(parser.parse('-[1, 2]'), [-1, -2])
+        self.assertEqual(parser.parse('[1, 2, 3] >= 2'), [False, True, True])
+        self.assertEqual(parser.parse('[1, 2] == [1, 3]'), [True, False])
+        self.assertTrue(parser.parse('2 * 3 != 5'))
+        with self.assertRaises(ValueError):
+            parser.parse('[1, 2] + [1, 2, 3]')
+
+        vals = parser.parse('tests.testmodel{t: 0}@val * 1.5')
+        self.assertEqual(vals, [0, 15, 30, 45])
+        self.assertEqual(parser.parse('(tests.testmodel{t: 0}@val * 2)[1]'), 20)
+        self.assertEqual(list(parser.parse_iter('tests.testmodel{t: 0}@val * 2')), [0, 20, 40, 60])
+        self.assertEqual(json.dumps(parser.parse('-tests.testmodel{t: 0}@val')), '[0, -10, -20, -30]')
+        ids = list(TestModel.objects.order_by('pk').values_list('id', flat=True))
+        differences = [i * 10 - pk for i, pk in enumerate(ids)]
+
+        # Pipes on a variable read its rows once
+        with self.assertNumQueries(1):
+            vals = parser.parse([
+                'a = tests.testmodel{t: 0}[id, val]',
+                'a@val - a@id',
+            ])
+        self.assertEqual(vals, differences)
+
+        # Separate columns are read in primary key order
+        with CaptureQueriesContext(connection) as queries:
+            vals = parser.parse(['b = tests.testmodel{t: 0}', 'b@val - b@id'])
+        self.assertEqual(vals, differences)
+        self.assertTrue(all('ORDER BY' in q['sql'] for q in queries))
+        self.assertEqual(parser.parse('[[1, 2], [3, 4]]@1 * 2'), [4, 8])
+        self.assertEqual(parser.parse('2 * [{a: 1}, {a: 2}]@a + 1'), [3, 5])
+
+        # Reductions
+        self.assertEqual(parser.parse('max([3, 9, 2])'), 9)
+        self.assertEqual(parser.parse('percentile([1, 2, 3, 4], 50)'), 2.5)
+        self.assertEqual(parser.parse('sum(tests.testmodel{t: 0}@val * 2)'), 120)
+        self.assertEqual(parser.parse('percentile(tests.testmodel{t: 0}@val, 100)'), 30)
+        with self.assertNumQueries(1):
+            self.assertEqual(parser.parse('min(tests.testmodel{t: 0}@val)'), 0)
+        with self.assertNumQueries(1):
+            with self.assertRaisesMessage(ValueError, 'max() of an empty column'):
+                parser.parse('max(tests.testmodel{t: 5}@val)')
+
+    def test_elementwise(self):
+        with mock.patch('orml.vector.numpy', None):
+            self.check_elementwise()
+
+    @skipIf(vector.numpy is None, 'NumPy is not installed')
+    def test_elementwise_numpy(self):
+        self.check_elementwise()
+
+    def test_paging(self):
+        for i in range(6):
+            TestModel.objects.create(t=i % 2, val=(i * 10) % 40, note='Test Model')
+
+        rows = parser.parse('tests.testmodel{val__gte: 0}[id, val] order -val limit 3')
+        self.assertEqual([r['val'] for r in rows], [30, 20, 10])
+        rows = parser.parse('tests.testmodel{val__gte: 0}[id, val] offset 2 limit 2 order [val, -id]')
+        self.assertEqual([r['val'] for r in rows], [10, 10])
+        self.assertEqual(len(parser.parse('tests.testmodel{t: 0} limit 2')), 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            list(parser.parse('tests.testmodel{val__gte: 0}[id] order -id limit 2 offset 1'))
+        self.assertIn('LIMIT 2 OFFSET 1', queries[-1]['sql'])
+
+        # Keyset pagination
+        ids = list(TestModel.objects.order_by('val', 'pk').values_list('pk', flat=True))
+        page = list(parser.parse('tests.testmodel{val__gte: 0}[id, val] order val limit 2'))
+        seen = [r['id'] for r in page]
+        while page:
+            page = list(parser.parse([
+                'cursor = {}'.format(page[-1]['id']),
+                'tests.testmodel{val__gte: 0}[id, val] order val after cursor limit 2',
+            ]))
+            seen += [r['id'] for r in page]
+        self.assertEqual(seen, ids)
+        rows = parser.parse('tests.testmodel{val__gte: 0}[id] after %d' % ids[0])
+        self.assertEqual(len(rows), 5)
+
+        # Lists are sorted and sliced in Python
+        self.assertEqual(parser.parse('[{a: 2}, {a: 1}, {a: 3}] order -a limit 2'),
+                         [{'a': 3}, {'a': 2}])
+        with self.assertRaises(ValueError):
+            parser.parse('[1, 2] after 1')
+        with self.assertRaises(ValueError):
+            parser.parse('[[3, 1], [1, 2]] order x')
+        self.assertEqual(parser.parse('[{a: 2}, {b: 1}] order a'), [{'b': 1}, {'a': 2}])
+
+        # Clauses after parentheses page the paged result
+        self.assertEqual(parser.parse('([1, 2, 3, 4, 5] limit 3) offset 2'), [3])
+        rows = parser.parse('(tests.testmodel{val__gte: 0}[5] order -val limit 3) order id')
+        self.assertEqual(sorted(r['val'] for r in rows), [10, 20, 30])
+        self.assertEqual([r['id'] for r in rows], sorted(r['id'] for r in rows))
+
+        # The keywords are names anywhere an expression hasn't just ended
+        self.assertEqual(parser.parse('{order: 1, limit: 2}'), {'order': 1, 'limit': 2})
+        self.assertEqual(parser.parse(['offset = 2', 'after = 1', '[1, 2, 3] offset offset']), [3])
+        self.assertEqual(parser.parse('[{order: 2}, {order: 1}] order order limit 1'),
+                         [{'order': 1}])
+
+        # after on grouped results and annotations
+        with self.assertRaises(ValueError):
+            parser.parse('tests.testmodel{t: 0}[distinct, t, s: Sum(val)] after %d' % ids[0])
+        with self.assertRaises(ValueError):
+            parser.parse('tests.testmodel{t: 0}[distinct, t, s: Sum(val)] order s after 1')
+
+        # Null cursor values, nulls are lowest in both directions
+        TestModel.objects.filter(val__in=[0, 20]).update(note=None)
+        TestModel.objects.filter(val=10).update(note='B')
+        for key in ('[note, id]', '[-note, -id]'):
+            expected = sorted(TestModel.objects.values_list('note', 'pk'),
+                              key=lambda r: (r[0] is not None, r[0] or '', r[1]),
+                              reverse='-' in key)
+            expected = [pk for note, pk in expected]
+            page = parser.parse('tests.testmodel{val__gte: 0}[id] order %s limit 2' % key)
+            seen = [r['id'] for r in page]
+            while page:
+                page = parser.parse('tests.testmodel{val__gte: 0}[id] order %s after %d limit 2'
+                                    % (key, seen[-1]))
+                seen += [r['id'] for r in page]
+            self.assertEqual(seen, expected)
+
+    def test_model_rows(self):
+        parent = TestModel.objects.create(t=TestModel.T1, val=5, note='Test Model')
+        TestModelChild.objects.create(parent=parent, name='child')
+
+        # Rows are read with values_list, no model instances are built
+        with mock.patch.object(TestModel, 'from_db', side_effect=AssertionError), \
+                mock.patch.object(TestModelChild, 'from_db', side_effect=AssertionError):
+            rows = parser.parse('tests.testmodel{t: 0}[5]')
+            self.assertEqual(rows, [{'id': parent.id, 't': 0, 'val': 5, 'note': 'Test Model'}])
+            rows = parser.parse('tests.testmodelchild{name: "child"}[5]')
+            self.assertEqual(rows[0]['parent'], parent.id)
+            rows = list(parser.parse_iter('tests.testmodelchild{name: "child"}[5]'))
+            self.assertEqual(rows[0]['name'], 'child')
+
+    def test_column_builder(self):
+        builder = ColumnBuilder()
+        builder.extend([1, 2])
+        self.assertEqual(builder.data.typecode, 'q')
+        builder.extend([2.5])
+        self.assertEqual(builder.data.typecode, 'd')
+        builder.extend([3, None])
+        self.assertEqual(builder.data, [1.0, 2.0, 2.5, 3, None])
+
+        builder = ColumnBuilder()
+        builder.extend([True, False])
+        builder.extend([None])
+        self.assertEqual(builder.data, [True, False, None])
+
+    def test_compiled_program_cache(self):
+        program = parser.compile(['a=2', 'a*15'])
+        self.assertIs(program, parser.compile(['a=2', 'a*15']))
+        self.assertIs(program, parser.compile('a=2\na*15'))
+        self.assertIsNot(program, parser.compile(['a=3', 'a*15']))
+
+        # Every execution gets a fresh scope
+        self.assertEqual(parser.execute(program), 30)
+        self.assertEqual(parser.execute(program), 30)
+        self.assertEqual(parser.parse('a'), 'a')
+
+    def test_shipped_parse_tables(self):
+        # Run ./manage.py orml_parsetab if this fails after a grammar change
+        reflect = yacc.ParserReflect(vars(parser))
+        reflect.get_all()
+        self.assertEqual(parsetab._lr_signature, reflect.signature())
+
+    def test_threaded_compile(self):
+        errors = []
+
+        def compile_many(n):
+            try:
+                for i in range(50):
+                    program = parser.compiler.compile(['a={}*{}'.format(n, i), 'a'])
+                    self.assertEqual(program.statements[0].value.right, i)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=compile_many, args=(n, )) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
+    def test_snapshots(self):
+        user = get_user_model().objects.create(username='orml')
+        content_type = ContentType.objects.get_for_model(TestModel)
+        for i in range(5):
+            TestModel.objects.create(t=TestModel.T1, val=i, note='Test Model')
+        TestModel.objects.create(t=TestModel.T2, val=100, note='Test Model')
+
+        vals = Snapshot.objects.create(
+            name='vals', namespace='vals', save_meta=True,
+            query=Query.objects.create(
+                name='vals', creator=user, query='tests.testmodel{t: 0}[id, val]'),
+            meta_content_type=content_type, meta_object_key='id'
+        )
+        Snapshot.objects.create(
+            name='notes', namespace='notes', save_meta=True,
+            query=Query.objects.create(
+                name='notes', creator=user, query='tests.testmodel{val__gte: 0}[id, note]'),
+            meta_content_type=content_type, meta_object_key='id'
+        )
+
+        out = StringIO()
+        call_command('orml_snapshots', batch_size=2, stdout=out)
+        self.assertIn('rows/sec', out.getvalue())
+        self.assertEqual(SnapshotMeta.objects.count(), 6)
+
+        TestModel.objects.filter(val=3).update(val=30)
+        call_command('orml_snapshots', batch_size=2, stdout=StringIO())
+        self.assertEqual(SnapshotMeta.objects.count(), 6)
+
+        test_model = TestModel.objects.get(val=30)
+        data = SnapshotMeta.objects.get(object_id=test_model.id).json_data
+        self.assertEqual(data['vals'], {'id': test_model.id, 'val': 30})
+        self.assertEqual(data['notes']['note'], 'Test Model')
+
+        data = SnapshotMeta.objects.get(
+            object_id=TestModel.objects.get(t=TestModel.T2).id).json_data
+        self.assertNotIn('vals', data)
+
+        # Snapshot data can be filtered on by key
+        result = parser.parse('orml.snapshotmeta{json_data__vals__val__gte: 20}[object_id]')
+        self.assertEqual([r['object_id'] for r in result], [test_model.id])
+
+        # A failing snapshot is reported without stopping the others
+        vals.query.query = '5'
+        vals.query.save()
+        out, err = StringIO(), StringIO()
+        call_command('orml_snapshots', stdout=out, stderr=err)
+        self.assertIn('2 snapshots, 1 failed', out.getvalue())
+        self.assertIn('vals (#{}) failed'.format(vals.id), err.getvalue())
+
+    def test_shared_namespace(self):
+        user = get_user_model().objects.create(username='orml')
+        test_model = TestModel.objects.create(t=TestModel.T1, val=5, note='Test Model')
+        snapshots = [Snapshot.objects.create(
+            name=name, namespace='vals', save_meta=True, save_history=True,
+            query=Query.objects.create(name=name, creator=user, query=query),
+            meta_content_type=ContentType.objects.get_for_model(TestModel),
+            meta_object_key='id'
+        ) for name, query in [('vals', 'tests.testmodel{t: 0}[id, val]'),
+                              ('notes', 'tests.testmodel{t: 0}[id, note]')]]
+
+        # Snapshots sharing a namespace merge their keys into it
+        for snapshot in snapshots:
+            save_snapshot_meta(snapshot)
+        data = SnapshotMeta.objects.get(object_id=test_model.id).json_data
+        self.assertEqual(data['vals'], {'id': test_model.id, 'val': 5, 'note': 'Test Model'})
+
+        TestModel.objects.filter(pk=test_model.pk).update(val=6)
+        save_snapshot_meta(snapshots[0])
+        data = SnapshotMeta.objects.get(object_id=test_model.id).json_data
+        self.assertEqual(data['vals'], {'id': test_model.id, 'val': 6, 'note': 'Test Model'})
+
+        # Keys of the other snapshot aren't recorded as removed
+        deltas = SnapshotHistory.objects.order_by('id').values_list('delta', flat=True)
+        self.assertEqual(list(deltas), [
+            {'id': test_model.id, 'val': 5}, {'note': 'Test Model'}, {'val': 6}])
+
+    def test_incremental_snapshots(self):
+        user = get_user_model().objects.create(username='orml')
+        for i in range(5):
+            TestModel.objects.create(t=TestModel.T1, val=i, note='Test Model')
+
+        snapshot = Snapshot.objects.create(
+            name='vals', namespace='vals', save_meta=True,
+            query=Query.objects.create(
+                name='vals', creator=user, query='tests.testmodel{t: 0}[id, val]'),
+            meta_content_type=ContentType.objects.get_for_model(TestModel),
+            meta_object_key='id', watermark_field='id'
+        )
+        self.assertEqual(save_snapshot_meta(snapshot), 5)
+        self.assertEqual(snapshot.watermark, str(TestModel.objects.latest('id').id))
+        self.assertEqual(save_snapshot_meta(snapshot), 0)
+
+        TestModel.objects.create(t=TestModel.T1, val=10, note='Test Model')
+        TestModel.objects.create(t=TestModel.T2, val=20, note='Test Model')
+        self.assertEqual(save_snapshot_meta(snapshot), 1)
+        self.assertEqual(SnapshotMeta.objects.count(), 6)
+
+        self.assertEqual(save_snapshot_meta(snapshot, full=True), 6)
+
+    def test_snapshot_history(self):
+        user = get_user_model().objects.create(username='orml')
+        for i in range(3):
+            TestModel.objects.create(t=TestModel.T1, val=i, note='Test Model')
+        test_model = TestModel.objects.get(val=1)
+
+        snapshot = Snapshot.objects.create(
+            name='vals', namespace='vals', save_meta=True, save_history=True,
+            query=Query.objects.create(
+                name='vals', creator=user, query='tests.testmodel{t: 0}[id, val]'),
+            meta_content_type=ContentType.objects.get_for_model(TestModel),
+            meta_object_key='id'
+        )
+        save_snapshot_meta(snapshot)
+        self.assertEqual(SnapshotHistory.objects.count(), 3)
+        self.assertEqual(SnapshotHistory.objects.get(object_id=test_model.id).delta,
+                         {'id': test_model.id, 'val': 1})
+
+        # Only changed values are recorded
+        TestModel.objects.filter(val=1).update(val=10)
+        save_snapshot_meta(snapshot)
+        self.assertEqual(SnapshotHistory.objects.count(), 4)
+        first, second = snapshot.runs.order_by('id')
+        self.assertEqual(second.rows, 3)
+
+        result = parser.parse('orml.history.vals{object_id: %d}[run, delta]' % test_model.id)
+        self.assertEqual(list(result), [
+            {'run': first.id, 'delta': {'id': test_model.id, 'val': 1}},
+            {'run': second.id, 'delta': {'val': 10}},
+        ])
+
+        result = parser.parse('orml.history.vals{object_id: %d, since: "%s"}@delta' % (
+            test_model.id, second.started.isoformat()))
+        self.assertEqual(list(result), [{'val': 10}])
+        self.assertEqual(len(parser.parse('orml.history.notes{object_id: %d}' % test_model.id)), 0)
+        self.assertEqual(referenced_models(parser.compile('orml.history.vals{object_id: 1}')),
+                         {'orml.snapshotrun', 'orml.snapshothistory'})
+
+    @override_settings(
+        ORML_RESULT_CACHE='default',
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_result_cache(self):
+        user = get_user_model().objects.create(username='orml')
+        TestModel.objects.create(t=TestModel.T1, val=10, note='Test Model')
+        query = Query.objects.create(
+            name='vals', creator=user, cache_timeout=60,
+            query='tests.testmodel{t: 0}[id, val]')
+        self.assertEqual(referenced_models(parser.compile(query.query)),
+                         {'tests.testmodel'})
+
+        result_cache.reset_stats()
+        self.assertEqual(len(query.execute(user)), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(query.execute(user)), 1)
+        self.assertEqual(result_cache.stats(), {'hits': 1, 'misses': 1})
+
+        # Saving a model the query reads from invalidates its results
+        TestModelChild.objects.create(parent=TestModel.objects.get(), name='child')
+        with self.assertNumQueries(0):
+            query.execute(user)
+        TestModel.objects.create(t=TestModel.T1, val=20, note='Test Model')
+        self.assertEqual(len(query.execute(user)), 2)
+        self.assertEqual(result_cache.stats(), {'hits': 2, 'misses': 2})
+
+        query.cache_timeout = None
+        with self.assertNumQueries(1):
+            self.assertEqual(len(query.execute(user)), 2)
+
+        # Models reached through relation lookups invalidate results too
+        self.assertEqual(referenced_models(parser.compile('tests.testmodelchild{parent__val__gte: 0}')),
+                         {'tests.testmodelchild', 'tests.testmodel'})
+        self.assertEqual(referenced_models(parser.compile('tests.testmodel{t: 0}[Count("testmodelchild")]')),
+                         {'tests.testmodel', 'tests.testmodelchild'})
+        children = Query.objects.create(
+            name='children', creator=user, cache_timeout=60,
+            query='tests.testmodelchild{parent__val__gte: 15}[name]')
+        self.assertEqual(len(children.execute(user)), 0)
+        TestModel.objects.filter(val=10).update(val=30)
+        TestModel.objects.get(val=30).save()
+        self.assertEqual(len(children.execute(user)), 1)
+
+    def test_query_parameters(self):
+        user = get_user_model().objects.create(username='orml')
+        for i in range(4):
+            TestModel.objects.create(t=i % 2, val=i * 10, note='Test Model')
+        query = Query.objects.create(
+            name='vals', creator=user,
+            query='tests.testmodel{t: kind, val__in: vals}[Sum(val)]')
+        QueryParameter.objects.create(
+            query=query, name='Kind', variable='kind', default='0',
+            param_type=QueryParameter.INTEGER)
+        QueryParameter.objects.create(
+            query=query, name='Values', variable='vals', default='0,10,20,30',
+            is_array=True, param_type=QueryParameter.INTEGER)
+
+        self.assertEqual(query.execute()['val__sum'], 20)
+        misses = parser.compiler.misses
+        self.assertEqual(query.execute(kind='1')['val__sum'], 40)
+        self.assertEqual(query.execute(kind=1, vals='10, 20')['val__sum'], 10)
+        self.assertEqual(query.execute(vals=[0, 10])['val__sum'], 0)
+        self.assertEqual(parser.compiler.misses, misses)
+
+        parameter = QueryParameter(param_type=QueryParameter.DATE)
+        self.assertEqual(parameter.convert('2018-02-27').day, 27)
+
+    @override_settings(ROOT_URLCONF='orml.urls')
+    def test_query_export(self):
+        user = get_user_model().objects.create(username='orml')
+        for i in range(5):
+            TestModel.objects.create(t=i % 2, val=i * 10, note='Test Model')
+        query = Query.objects.create(
+            name='vals', creator=user, query='tests.testmodel{t: kind}[id, val]')
+        QueryParameter.objects.create(
+            query=query, name='Kind', variable='kind', default='0',
+            param_type=QueryParameter.INTEGER)
+
+        def export(format, as_user=user, **params):
+            url = reverse('orml-query-export', kwargs={'pk': query.pk, 'format': format})
+            request = RequestFactory().get(url, params)
+            request.user = as_user
+            return QueryExport.as_view()(request, pk=query.pk, format=format)
+
+        response = export('ndjson', kind='1')
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in response.streaming_content]
+        self.assertEqual([r['val'] for r in rows], [10, 30])
+
+        response = export('csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,val')
+        self.assertEqual([l.split(',')[1] for l in lines[1:]], ['0', '20', '40'])
+        self.assertIn('query-{}.csv'.format(query.pk), response['Content-Disposition'])
+
+        self.assertEqual(export('csv', kind='one').status_code, 400)
+
+        # Only the creator, staff and users with view_query can export
+        other = get_user_model().objects.create(username='other')
+        with self.assertRaises(PermissionDenied):
+            export('csv', as_user=other)
+        other.user_permissions.add(Permission.objects.get(codename='view_query'))
+        other = get_user_model().objects.get(pk=other.pk)
+        self.assertEqual(export('csv', as_user=other).status_code, 200)
+        staff = get_user_model().objects.create(username='staff', is_staff=True)
+        self.assertEqual(export('csv', as_user=staff).status_code, 200)
+
+    def test_limits(self):
+        for i in range(5):
+            TestModel.objects.create(t=i % 2, val=i * 10, note='Test Model')
+
+        rows = parser.parse('tests.testmodel{val__gte: 0}[id, val]', limits={'max_rows': 5})
+        self.assertEqual(len(rows), 5)
+        with self.assertRaises(LimitExceeded) as e:
+            parser.parse('tests.testmodel{val__gte: 0}[5]', limits={'max_rows': 4})
+        self.assertEqual(e.exception.limit, 'max_rows')
+        with self.assertRaises(LimitExceeded):
+            list(parser.parse_iter('tests.testmodel{val__gte: 0}', limits={'max_rows': 4}))
+
+        # The limits only apply while the stream reads rows
+        rows = parser.parse_iter('tests.testmodel{val__gte: 0}[id, val]', chunk_size=2,
+                                 limits={'max_queries': 3})
+        self.assertEqual(next(rows)['val'], 0)
+        for i in range(5):
+            TestModel.objects.count()
+        self.assertEqual(len(list(rows)), 4)
+
+        statements = ['a = len(tests.testmodel{t: 0})', 'a + len(tests.testmodel{t: 1})']
+        self.assertEqual(parser.parse(statements, limits={'max_queries': 2}), 5)
+        with self.assertRaises(LimitExceeded):
+            parser.parse(statements, limits={'max_queries': 1})
+        with self.assertRaises(LimitExceeded):
+            parser.parse(['explain ' + statements[0], statements[1]], limits={'max_queries': 1})
+
+        # Columns used in arithmetic or passed to functions count their rows
+        with self.assertRaises(LimitExceeded):
+            parser.parse('tests.testmodel{val__gte: 0}@val * 2', limits={'max_rows': 3})
+        with CaptureQueriesContext(connection) as queries, self.assertRaises(LimitExceeded):
+            parser.parse('percentile(tests.testmodel{val__gte: 0}@val, 50)',
+                         limits={'max_rows': 3})
+        self.assertIn('LIMIT 4', queries[-1]['sql'])
+        self.assertEqual(parser.parse('-tests.testmodel{t: 1}@val', limits={'max_rows': 3}),
+                         [-10, -30])
+
+        # Columnar results read at most one row more than max_rows
+        with CaptureQueriesContext(connection) as queries, self.assertRaises(LimitExceeded):
+            parser.parse('tests.testmodel{val__gte: 0}[id, val]', format='columnar',
+                         limits={'max_rows': 2})
+        self.assertIn('LIMIT 3', queries[-1]['sql'])
+
+        with self.assertRaises(LimitExceeded):
+            parser.parse(['a = [1, 2, 3, 4, 5, 6, 7, 8]', 'a'], limits={'max_memory': 64})
+        with self.assertRaises(LimitExceeded):
+            parser.parse('tests.testmodel{t: 0}[id]', limits={'timeout': 0})
+
+        # The database is interrupted at the timeout
+        guard = Guard(Limits(timeout=0.05))
+        with self.assertRaises(LimitExceeded), guard.watch(), connection.cursor() as cursor:
+            cursor.execute('WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c '
+                           'WHERE x < 100000000) SELECT COUNT(*) FROM c')
+        self.assertEqual(len(TestModel.objects.all()), 5)
+
+    def test_user_limits(self):
+        user = get_user_model().objects.create(username='orml')
+        staff = get_user_model().objects.create(username='staff', is_staff=True)
+        for i in range(3):
+            TestModel.objects.create(t=TestModel.T1, val=i, note='Test Model')
+        query = Query.objects.create(
+            name='vals', creator=user, query='tests.testmodel{t: 0}[id, val]')
+
+        with self.settings(ORML_LIMITS={'max_rows': 2},
+                           ORML_USER_LIMITS='orml.tests.test_orml.staff_limits'):
+            with self.assertRaises(LimitExceeded):
+                query.execute(user)
+            self.assertEqual(len(query.execute(staff)), 3)
+
+            # Query limits only lower the user's
+            query.max_rows = 1
+            with self.assertRaises(LimitExceeded):
+                query.execute(staff)
+            query.max_rows = 10
+            with self.assertRaises(LimitExceeded):
+                query.execute(user)
+
+
+def worker_snapshots(snapshot_ids, batch_size=1000, full=False):
+    # Stands in for run_snapshots in pool workers, names results by worker pid
+    return [SnapshotResult(snapshot_id, '{}@{}'.format(snapshot_id, os.getpid()), 0, 0.0, None)
+            for snapshot_id in snapshot_ids]
+
+
+class TestConcurrentORML(TransactionTestCase):
+    def test_concurrent_statements(self):
+        for i in range(6):
+            TestModel.objects.create(t=i % 3, val=i * 10, note='Test Model')
+
+        statements = [
+            'a = tests.testmodel{t: 0}[{total: Sum(val)}]',
+            'b = tests.testmodel{t: 1}[{total: Sum(val)}]',
+            'c = tests.testmodel{t: 2}[{total: Sum(val)}]',
+            'ids = tests.testmodel{t: 0}[id]',
+            'n = len(tests.testmodel{id__in: ids})',
+            'x = 2',
+            '{a: a.total, b: b.total, c: c.total, sum: a.total + b.total + c.total, n: n * x}',
+        ]
+        self.assertEqual(parser.parse(statements, workers=4),
+                         parser.parse(statements, workers=1))
+        self.assertEqual(parser.parse(statements, workers=4)['sum'], 150)
+        with self.assertRaises(LimitExceeded):
+            parser.parse(statements, workers=4, limits={'max_queries': 2})
+
+        # Each pool thread's connection is closed once, when the pool is done
+        main = connections['default']
+        with mock.patch.object(type(main), 'close', autospec=True) as closed:
+            parser.parse(statements, workers=2)
+        self.assertTrue(1 <= closed.call_count <= 2)
+        self.assertTrue(all(c.args[0] is not main for c in closed.call_args_list))
+
+    def test_concurrent_statements_in_transaction(self):
+        statements = ['a = len(tests.testmodel{t: 0})', 'b = len(tests.testmodel{t: 0})', '[a, b]']
+        with transaction.atomic():
+            TestModel.objects.create(t=TestModel.T1, val=10, note='Test Model')
+            # Pool threads can't see the uncommitted row, statements run in order
+            self.assertEqual(parser.parse(statements, workers=2), [1, 1])
+
+    def test_parallel_snapshots(self):
+        user = get_user_model().objects.create(username='orml')
+        query = Query.objects.create(name='vals', creator=user, query='tests.testmodel{t: 0}[id, val]')
+        parents = ContentType.objects.get_for_model(TestModel)
+        children = ContentType.objects.get_for_model(TestModelChild)
+        snapshots = [
+            Snapshot.objects.create(name=name, namespace=name, save_meta=True, query=query,
+                                    meta_content_type=content_type, meta_object_key='id')
+            for name, content_type in (('a', parents), ('b', children), ('c', parents))
+        ]
+        a, b, c = [s.id for s in snapshots]
+        self.assertEqual(group_snapshots(snapshots), [[a, c], [b]])
+
+        out = StringIO()
+        with mock.patch('orml.management.commands.orml_snapshots.run_snapshots',
+                        worker_snapshots):
+            call_command('orml_snapshots', workers=2, stdout=out)
+        self.assertIn('3 snapshots, 0 failed', out.getvalue())
+
+        # Snapshots sharing a content type ran on the same worker process
+        workers = dict(line.split(':')[0].split('@') for line in out.getvalue().splitlines()
+                       if '@' in line)
+        self.assertEqual(set(workers), {str(a), str(b), str(c)})
+        self.assertEqual(workers[str(a)], workers[str(c)])
+        self.assertNotIn(str(os.getpid()), workers.values())
@@ -1,8 +1,11 @@
-from django.conf.urls import url
+from django.urls import re_path
 from . import views
 
 urlpatterns = [
-    url(r'^$',
-        view=views.Dashboard.as_view(),
-        name='orml-dashboard'),
+    re_path(r'^$',
+            view=views.Dashboard.as_view(),
+            name='orml-dashboard'),
+    re_path(r'^queries/(?P<pk>\d+)/export\.(?P<format>ndjson|csv)$',
+            view=views.QueryExport.as_view(),
+            name='orml-query-export'),
 ]
@@ -1,9 +1,14 @@
 try:
-    from dateparser import parser as parse_date
+    from dateparser import parse as parse_date
 except ImportError:
     from django.utils.dateparse import parse_date
 
-from django.db.models import Max, FloatField, Count, Aggregate
+import json
+from functools import lru_cache
+
+from django.db import NotSupportedError
+from django.db.models import Max, FloatField, Count, Aggregate, QuerySet, Func, JSONField
+from django.db.models.query import ModelIterable, FlatValuesListIterable
 
 from orml.helpers import ArgsKwargs
 
@@ -19,8 +24,43 @@ def model_fields(model):
     return fields
 
 
-def average(numbers):
-    return float(sum(numbers)) / max(len(numbers), 1)
+@lru_cache(maxsize=None)
+def row_fields(model):
+    """
+    (name, attname) of every field in a model's rows: the concrete editable
+    fields model_to_dict would give, foreign keys hold the related pk
+    """
+    return tuple((f.name, f.attname) for f in model._meta.concrete_fields
+                 if getattr(f, 'editable', False))
+
+
+def row_values(queryset):
+    """
+    Field names of a model QuerySet's rows and the values_list QuerySet to
+    read them with, so rows are built without model instances:
+    dict(zip(names, row)) for each row
+    """
+    fields = row_fields(queryset.model)
+    return [name for name, attname in fields], \
+        queryset.values_list(*[attname for name, attname in fields])
+
+
+def is_model_queryset(value):
+    # Decided from the queryset's iterable class so no rows are fetched
+    return isinstance(value, QuerySet) and \
+        issubclass(value._iterable_class, ModelIterable)
+
+
+def flat_column(queryset):
+    """
+    Name of the field a values_list(field, flat=True) QuerySet selects, None
+    for any other QuerySet
+    """
+    if not issubclass(queryset._iterable_class, FlatValuesListIterable):
+        return None
+    query = queryset.query
+    if len(query.values_select) == 1 and not query.annotation_select:
+        return query.values_select[0]
 
 
 def max_float(name):
@@ -39,6 +79,57 @@ def date(str_date):
     return parse_date(str_date)
 
 
+class JSONMerge(Func):
+    """
+    A JSON column with an object merged into one top-level key in the
+    database, so updating a key neither reads nor rewrites the rest of the
+    document in Python. Keys the object doesn't have are kept. On SQLite and
+    MySQL it's a JSON merge patch, where null values remove their key:
+    JSONMerge('json_data', 'vals', Value({...}, output_field=JSONField()))
+    """
+    output_field = JSONField()
+
+    def __init__(self, expression, key, value, **extra):
+        self.key = key
+        super(JSONMerge, self).__init__(expression, value, **extra)
+
+    def compile_arguments(self, compiler):
+        (column, column_params), (value, value_params) = [
+            compiler.compile(e) for e in self.get_source_expressions()]
+        return column, value, list(column_params), list(value_params)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(
+            'JSONMerge is not supported on {}'.format(connection.vendor))
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        column, value, column_params, value_params = self.compile_arguments(compiler)
+        sql = "jsonb_set(COALESCE({0}, '{{}}'::jsonb), ARRAY[%s]::text[], " \
+            "COALESCE({0} -> %s, '{{}}'::jsonb) || {1}::jsonb)"
+        return sql.format(column, value), \
+            column_params + [self.key] + column_params + [self.key] + value_params
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        column, value, column_params, value_params = self.compile_arguments(compiler)
+        path = '$.' + json.dumps(self.key)
+        sql = "JSON_SET(COALESCE({0}, '{{}}'), %s, " \
+            "JSON_PATCH(COALESCE(JSON_EXTRACT({0}, %s), '{{}}'), JSON({1})))"
+        return sql.format(column, value), \
+            column_params + [path] + column_params + [path] + value_params
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        column, value, column_params, value_params = self.compile_arguments(compiler)
+        path = '$.' + json.dumps(self.key)
+        if connection.mysql_is_mariadb:
+            value = "JSON_EXTRACT({}, '$')".format(value)
+        else:
+            value = "CAST({} AS JSON)".format(value)
+        sql = "JSON_SET(COALESCE({0}, JSON_OBJECT()), %s, " \
+            "JSON_MERGE_PATCH(COALESCE(JSON_EXTRACT({0}, %s), JSON_OBJECT()), {1}))"
+        return sql.format(column, value), \
+            column_params + [path] + column_params + [path] + value_params
+
+
 def split_queryset_arguments(t):
     values = []
     aggregate_args = []
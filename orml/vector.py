@@ -0,0 +1,129 @@
+import math
+import operator
+from array import array
+
+from django.db.models import QuerySet
+
+from orml.utils import flat_column
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+operators = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def is_column(value):
+    if type(value) in (list, array):
+        return True
+    if numpy is not None and isinstance(value, numpy.ndarray):
+        return True
+    # Pipes on QuerySets, e.g. a@val
+    return isinstance(value, QuerySet) and flat_column(value) is not None
+
+
+def as_column(value):
+    if isinstance(value, QuerySet):
+        value = list(value)
+    if numpy is not None:
+        return numpy.asarray(value)
+    return value
+
+
+def apply(op, left, right):
+    """
+    Applies a binary operator. When either side is a column (a list, array or
+    single column QuerySet) the operator is applied element-wise and a scalar
+    on the other side is broadcast. Runs on NumPy arrays when NumPy is
+    installed, the result is then a NumPy array.
+    """
+    function = operators[op]
+    left_column = is_column(left)
+    right_column = is_column(right)
+    if not left_column and not right_column:
+        return function(left, right)
+
+    left = as_column(left) if left_column else left
+    right = as_column(right) if right_column else right
+    if numpy is not None:
+        return function(left, right)
+
+    if left_column and right_column:
+        if len(left) != len(right):
+            raise ValueError('Columns of different lengths: {} and {}'.format(
+                len(left), len(right)))
+        return [function(l, r) for l, r in zip(left, right)]
+    elif left_column:
+        return [function(l, right) for l in left]
+    return [function(left, r) for r in right]
+
+
+def negate(value):
+    if is_column(value):
+        value = as_column(value)
+        if numpy is not None:
+            return -value
+        return [-v for v in value]
+    return -value
+
+
+def scalar(value):
+    # NumPy scalars to Python numbers
+    return value.item() if hasattr(value, 'item') else value
+
+
+def is_array(values):
+    return numpy is not None and isinstance(values, numpy.ndarray)
+
+
+def total(values):
+    if is_array(values):
+        return scalar(values.sum())
+    return sum(values)
+
+
+def average(values):
+    if is_array(values):
+        return float(values.mean()) if len(values) else 0.0
+    return float(sum(values)) / max(len(values), 1)
+
+
+def minimum(values):
+    if is_array(values):
+        return scalar(values.min())
+    return min(values)
+
+
+def maximum(values):
+    if is_array(values):
+        return scalar(values.max())
+    return max(values)
+
+
+def percentile(values, q):
+    """
+    q-th percentile of values, interpolating linearly between the closest
+    ranks like numpy.percentile does
+    """
+    if is_array(values):
+        return float(numpy.percentile(values, q))
+    values = sorted(values)
+    if not values:
+        raise ValueError('percentile of an empty column')
+    position = (len(values) - 1) * q / 100.0
+    low = math.floor(position)
+    high = math.ceil(position)
+    return values[low] + (values[high] - values[low]) * (position - low)
@@ -1,5 +1,74 @@
-from django.views.generic import TemplateView
+import csv
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import PermissionDenied
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.generic import TemplateView, View
+
+from orml.models import Query
 
 
 class Dashboard(TemplateView):
     template_name = 'orml/dashboard.html'
+
+
+class Echo:
+    # File-like object for csv.writer, writerow returns the formatted line
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    header = None
+    for row in rows:
+        if type(row) is dict:
+            if header is None:
+                header = list(row.keys())
+                yield writer.writerow(header)
+            yield writer.writerow([row.get(k) for k in header])
+        elif isinstance(row, (list, tuple)):
+            yield writer.writerow(row)
+        else:
+            yield writer.writerow([row])
+
+
+class QueryExport(LoginRequiredMixin, View):
+    """
+    Streams the rows of a saved query as NDJSON or CSV. GET parameters are
+    bound to the query's parameters, rows are read from the database in
+    chunks while the response is sent. Only the query's creator, staff and
+    users with the orml.view_query permission can export it.
+    """
+    chunk_size = 2000
+    formats = {
+        'ndjson': (ndjson_lines, 'application/x-ndjson'),
+        'csv': (csv_lines, 'text/csv'),
+    }
+
+    def get(self, request, pk, format):
+        query = get_object_or_404(Query, pk=pk)
+        if not self.can_export(request.user, query):
+            raise PermissionDenied
+        lines, content_type = self.formats[format]
+        try:
+            rows = query.iterate(request.user, self.chunk_size, **request.GET.dict())
+        except (TypeError, ValueError) as e:
+            return HttpResponseBadRequest(str(e))
+
+        response = StreamingHttpResponse(lines(rows), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="query-{}.{}"'.format(
+            query.pk, format)
+        return response
+
+    def can_export(self, user, query):
+        return query.creator_id == user.pk or user.is_staff or \
+            user.has_perm('orml.view_query')
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import django
+from django.conf import settings
+
+DIRNAME = os.path.dirname(os.path.abspath(__file__))
+
+STATEMENT = 'tests.testmodel{note__icontains: "test model" | val__gte: 10}' \
+            '[distinct, t, avg: Avg(val), count: Count("*")]'
+
+
+def configure(database):
+    settings.configure(DEBUG=False,
+                       DATABASES={
+                           'default': {
+                               'ENGINE': 'django.db.backends.sqlite3',
+                               'NAME': database,
+                           }
+                       },
+                       INSTALLED_APPS=('django.contrib.auth',
+                                       'django.contrib.contenttypes',
+                                       'orml',
+                                       'orml.tests',
+                       ),
+                       DEFAULT_AUTO_FIELD='django.db.models.AutoField')
+    django.setup()
+
+
+def populate(rows, batch_size=10000):
+    from django.core.management import call_command
+    from orml.tests.models import TestModel, TestModelChild
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    if TestModel.objects.count() == rows:
+        return
+
+    TestModelChild.objects.all().delete()
+    TestModel.objects.all().delete()
+    for start in range(0, rows, batch_size):
+        TestModel.objects.bulk_create([
+            TestModel(id=i + 1, t=i % 3, val=i % 1000, note='Test Model {}'.format(i))
+            for i in range(start, min(start + batch_size, rows))
+        ])
+        TestModelChild.objects.bulk_create([
+            TestModelChild(parent_id=i + 1, name='Child {}'.format(i))
+            for i in range(start, min(start + batch_size, rows))
+        ])
+
+
+def measure(fn, repeat, number=1):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - start) / number)
+    return {
+        'min': min(runs),
+        'median': statistics.median(runs),
+        'mean': statistics.mean(runs),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def benchmarks():
+    from django.contrib.auth import get_user_model
+    from django.contrib.contenttypes.models import ContentType
+    from django.core.management import call_command
+    from orml import parser
+    from orml.helpers import MultiParser
+    from orml.models import Query, Snapshot
+    from orml.tests.models import TestModel
+
+    def tokenize():
+        tokenizer = parser.compiler.lexer.clone()
+        tokenizer.input(STATEMENT)
+        for token in tokenizer:
+            pass
+
+    def parse():
+        parser.compiler.get_parser().parse(STATEMENT, lexer=parser.compiler.lexer.clone())
+
+    def snapshots():
+        call_command('orml_snapshots', stdout=open(os.devnull, 'w'))
+
+    user, created = get_user_model().objects.get_or_create(username='orml-benchmark')
+    Snapshot.objects.all().delete()
+    Snapshot.objects.create(
+        name='vals', namespace='vals', save_meta=True,
+        query=Query.objects.create(
+            name='vals', creator=user, query='tests.testmodel{t: 0}[id, val]'),
+        meta_content_type=ContentType.objects.get_for_model(TestModel),
+        meta_object_key='id'
+    )
+
+    return [
+        # name, function, inner loop count
+        ('tokenize', tokenize, 1000),
+        ('parse', parse, 1000),
+        ('compile_cached', lambda: parser.compile(STATEMENT), 1000),
+        ('multiparser', lambda: MultiParser(parser.compiler, None), 1000),
+        ('filter', lambda: list(parser.parse('tests.testmodel{t: 1}[id, val]')), 1),
+        ('filter_models', lambda: len(parser.parse('tests.testmodel{t: 1}[5]')), 1),
+        ('aggregate', lambda: parser.parse(
+            'tests.testmodel{t: 1}[{avg: Avg(val), total: Sum(val), n: Count(id)}]'), 1),
+        ('distinct', lambda: list(parser.parse(STATEMENT)), 1),
+        ('pipe', lambda: list(parser.parse('tests.testmodel{t: 1}@val')), 1),
+        ('pipe_sum', lambda: parser.parse('sum(tests.testmodel{t: 1}@val)'), 1),
+        ('stream', lambda: sum(1 for r in parser.parse_iter('tests.testmodel{t: 1}[id, val]')), 1),
+        ('snapshots', snapshots, 1),
+    ]
+
+
+def compare(results, baseline):
+    print('{:<16} {:>12} {:>12} {:>8}'.format('benchmark', 'baseline', 'current', 'change'))
+    for name, current in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['median']
+        after = current['median']
+        print('{:<16} {:>12.6f} {:>12.6f} {:>+7.1f}%'.format(
+            name, before, after, (after - before) / before * 100))
+
+
+def main():
+    arguments = argparse.ArgumentParser(description='Benchmarks django-orml on SQLite')
+    arguments.add_argument('--rows', type=int, default=10000,
+                           help='Rows of synthetic TestModel/TestModelChild data')
+    arguments.add_argument('--repeat', type=int, default=5)
+    arguments.add_argument('--database', default=None,
+                           help='SQLite file, reused between runs with the same --rows')
+    arguments.add_argument('--only', nargs='*', help='Benchmark names to run')
+    arguments.add_argument('--output', default='bench_output.json')
+    arguments.add_argument('--compare', help='Results file of an earlier run')
+    options = arguments.parse_args()
+
+    database = options.database or os.path.join(
+        tempfile.gettempdir(), 'orml-benchmark-{}.db'.format(options.rows))
+    configure(database)
+    populate(options.rows)
+
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=DIRNAME).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    results = {
+        'commit': commit,
+        'rows': options.rows,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'results': {},
+    }
+    for name, fn, number in benchmarks():
+        if options.only and name not in options.only:
+            continue
+        results['results'][name] = measure(fn, options.repeat, number)
+        print('{:<16} {:.6f}s'.format(name, results['results'][name]['median']))
+
+    with open(options.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if options.compare:
+        with open(options.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    sys.exit(main())